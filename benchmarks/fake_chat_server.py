@@ -0,0 +1,71 @@
+# fake_chat_server.py
+"""本地模拟的流式聊天接口，用于在不访问真实API的情况下测试搜索模块
+
+用法（在项目根目录）：python -m benchmarks.fake_chat_server [端口]
+然后在 data/settings.json 中设置 "api_url": "http://127.0.0.1:<端口>/v1/chat/completions"
+每个请求按字符流式返回 "echo: <最后一条消息>"（非流式请求直接返回JSON），
+并在控制台打印请求次数，便于确认回复缓存是否命中。
+"""
+import sys
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_PORT = 8765
+CHUNK_DELAY = 0.02  # 每个增量之间的间隔（秒）
+
+
+class ChatHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # 支持keep-alive
+    requests_served = 0
+
+    def do_HEAD(self):
+        # 连接预热请求
+        self.send_response(404)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        messages = body.get("messages", [])
+        text = "echo: " + (messages[-1]["content"] if messages else "")
+        ChatHandler.requests_served += 1
+        print(f"第{ChatHandler.requests_served}次请求，{len(messages)}条消息")
+        if not body.get("stream"):
+            # 非流式请求（如生成摘要）一次返回完整JSON
+            reply = json.dumps({"choices": [{"message": {"role": "assistant", "content": text}}]},
+                               ensure_ascii=False).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(reply)))
+            self.end_headers()
+            self.wfile.write(reply)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for ch in text:
+            delta = {"choices": [{"delta": {"content": ch}}]}
+            self._chunk(b"data: " + json.dumps(delta, ensure_ascii=False).encode("utf-8") + b"\n\n")
+            time.sleep(CHUNK_DELAY)
+        self._chunk(b"data: [DONE]\n\n")
+        self._chunk(b"")
+
+    def _chunk(self, data):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def log_message(self, *args):
+        pass
+
+
+def main():
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_PORT
+    print(f"模拟接口已启动: http://127.0.0.1:{port}/v1/chat/completions")
+    ThreadingHTTPServer(("127.0.0.1", port), ChatHandler).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
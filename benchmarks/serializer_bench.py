@@ -0,0 +1,68 @@
+# serializer_bench.py
+"""比较各序列化后端在5万条记录上的保存/加载耗时与文件大小
+
+用法（在项目根目录）：python -m benchmarks.serializer_bench [记录数]
+"""
+import os
+import sys
+import time
+import random
+import tempfile
+from datetime import datetime, timedelta
+
+from modules import serializers
+
+DEFAULT_RECORDS = 50000
+ROUNDS = 3
+
+
+def make_dataset(count):
+    """生成与卡片/番茄钟数据结构相近的测试数据"""
+    start = datetime(2024, 1, 1)
+    return {
+        "cards": [{
+            "id": i,
+            "title": f"卡片标题 {i}",
+            "answer": "答案内容 " * random.randint(1, 8),
+            "tags": random.sample(["数学", "英语", "物理", "tag_1", "review"], 2),
+            "folder": "默认文件夹",
+            "proficiency": random.randint(0, 100),
+            "last_practiced": (start + timedelta(minutes=i)).isoformat()
+        } for i in range(count)]
+    }
+
+
+def bench(serializer, data, path):
+    save_times, load_times = [], []
+    for _ in range(ROUNDS):
+        begin = time.perf_counter()
+        with open(path, "wb") as f:
+            f.write(serializer.dumps(data))
+        save_times.append(time.perf_counter() - begin)
+
+        begin = time.perf_counter()
+        with open(path, "rb") as f:
+            serializers.detect(f.read()[:16])  # 与safe_load一致：先识别格式
+            f.seek(0)
+            serializer.loads(f.read())
+        load_times.append(time.perf_counter() - begin)
+    return min(save_times), min(load_times), os.path.getsize(path)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_RECORDS
+    random.seed(0)
+    data = make_dataset(count)
+    print(f"记录数: {count}，每项取{ROUNDS}次中的最好成绩")
+    print(f"{'格式':<12}{'保存(ms)':>10}{'加载(ms)':>10}{'大小(KB)':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, serializer in serializers.SERIALIZERS.items():
+            save, load, size = bench(serializer, data, os.path.join(tmp, name))
+            print(f"{name:<12}{save * 1000:>10.1f}{load * 1000:>10.1f}{size / 1024:>12.1f}")
+    missing = {"orjson", "msgpack"} - set(serializers.SERIALIZERS)
+    if missing:
+        print(f"未安装，已跳过: {', '.join(sorted(missing))}")
+
+
+if __name__ == "__main__":
+    main()
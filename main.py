@@ -9,14 +9,18 @@ from PyQt5.QtWebEngineWidgets import QWebEngineView
 
 # 导入各功能模块
 from modules.search import SearchModule
+from modules.chat_stream import API_URL, RESPONSE_CACHE_BYTES, RESPONSE_CACHE_TTL
+from modules.chat_context import CONTEXT_TOKEN_BUDGET
 from modules.todo import TodoModule
 from modules.card_memory import CardMemoryModule
-from modules.notes import NotesModule
+from modules.notes import NotesModule, NOTES_CACHE_BYTES
 from modules.pomodoro import PomoModule
 from modules.music import MusicModule
 from modules.stats import StatsModule
 from modules.settings import SettingsModule
 from modules.data_manager import DataManager
+from modules.web_assets import register_scheme, install_asset_handler, missing_assets
+from modules.formula_cache import FormulaCache, FORMULA_CACHE_DIR
 
 import logging
 
@@ -39,7 +43,10 @@ class MainWindow(QMainWindow):
         self.active_pomo_task = None  # 新增：活动的番茄钟任务
         # 初始化前加载设置
         self.load_settings()
-        self.data_manager = DataManager()  # 新增
+        self.data_manager = DataManager(
+            journal_datasets=self.settings.get("journal_datasets", []),
+            write_delay=self.settings.get("write_delay_ms", 500) / 1000,
+            formats=self.settings.get("serializers", {}))
         # 主窗口设置
         self.setWindowTitle("Stutrix")
         self.setGeometry(100, 100, 1400, 900)
@@ -154,13 +161,23 @@ class MainWindow(QMainWindow):
     def setup_modules(self):
         """初始化各功能模块"""
         # 注意模块初始化顺序
-        self.todo_module = TodoModule()
+        self.todo_module = TodoModule(self.data_manager)
+        # 笔记预览和聊天页面共用公式SVG缓存
+        self.formula_cache = FormulaCache(os.path.join(self.data_manager.data_dir, FORMULA_CACHE_DIR))
         self.modules = {
-            "搜索": SearchModule(),
+            "搜索": SearchModule(self.data_manager,
+                               api_url=self.settings.get("api_url", API_URL),
+                               warm_up=self.settings.get("warm_up_connection", True),
+                               cache_bytes=self.settings.get("response_cache_bytes", RESPONSE_CACHE_BYTES),
+                               cache_ttl=self.settings.get("response_cache_ttl", RESPONSE_CACHE_TTL),
+                               context_budget=self.settings.get("context_token_budget", CONTEXT_TOKEN_BUDGET),
+                               formula_cache=self.formula_cache),
             "待办": self.todo_module,
-            "卡片": CardMemoryModule(),
-            "笔记": NotesModule(),
-            "番茄": PomoModule(self.todo_module),
+            "卡片": CardMemoryModule(self.data_manager),
+            "笔记": NotesModule(self.data_manager,
+                                 cache_bytes=self.settings.get("notes_cache_bytes", NOTES_CACHE_BYTES),
+                                 formula_cache=self.formula_cache),
+            "番茄": PomoModule(self.todo_module, self.data_manager),
             "音乐": MusicModule(),
             "统计": StatsModule(),
             "设置": SettingsModule(self)
@@ -279,15 +296,14 @@ class MainWindow(QMainWindow):
     def load_settings(self):
         """加载全局设置"""
         try:
-            with open("data/settings.json") as f:
+            with open("data/settings.json", encoding="utf-8") as f:
                 self.settings = json.load(f)
         except FileNotFoundError:
             self.settings = {"theme": "default"}
 
     def save_settings(self):
-        """保存全局设置"""
-        with open("data/settings.json", "w") as f:
-            json.dump(self.settings, f, indent=2)
+        """保存全局设置（后台写入）"""
+        self.data_manager.schedule_save("settings.json", self.settings)
 
     # --------------------- 事件处理 ---------------------
     def closeEvent(self, event):
@@ -298,6 +314,9 @@ class MainWindow(QMainWindow):
                 module.save_data()
         # 保存全局设置
         self.save_settings()
+        # 等待后台写入全部落盘
+        self.data_manager.flush()
+        self.data_manager.close()
         super().closeEvent(event)
 
     def toggle_fullscreen(self):
@@ -356,8 +375,19 @@ class NavButton(QToolButton):
         """)
 
 if __name__ == "__main__":
+    register_scheme()  # 自定义协议需在创建QApplication之前注册
     app = QApplication(sys.argv)
     app.setStyle("Fusion")
+    missing = missing_assets()
+    if missing:
+        # 没有这些文件预览和聊天页面无法渲染公式和代码，直接提示安装步骤
+        logging.error(f"缺少前端资源: {missing}")
+        QMessageBox.critical(None, "缺少前端资源",
+                             "未找到 assets/vendor 下的MathJax、highlight.js：\n"
+                             + "\n".join(missing)
+                             + "\n\n请在项目根目录运行 python -m modules.web_assets 后重新启动。")
+        sys.exit(1)
+    install_asset_handler()  # MathJax、highlight.js 从本地提供，页面无需联网
     
     # 加载自定义字体
     font = QFont("Segoe UI", 10)
@@ -0,0 +1,250 @@
+# backup_store.py
+import os
+import re
+import json
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+OBJECTS_DIR = "objects"
+INDEX_DIR = "index"
+PRUNE_INTERVAL = 3600  # 后台清理间隔（秒）
+LEGACY_BACKUP = re.compile(r"^(?P<file>.+)\.(?P<stamp>\d{8}_\d{6})\.bak$")  # 旧版备份文件名
+
+# 保留策略：(时间范围, 分桶粒度)。1小时内全部保留，1天内每小时一份，30天内每天一份
+DEFAULT_RETENTION = [
+    (timedelta(hours=1), None),
+    (timedelta(days=1), timedelta(hours=1)),
+    (timedelta(days=30), timedelta(days=1)),
+]
+
+
+class BackupStore:
+    """内容寻址的备份仓库：相同内容只存一份，每个数据文件有独立的版本索引"""
+
+    def __init__(self, backup_dir: str, retention: Optional[List] = None):
+        self.backup_dir = backup_dir
+        self.objects_dir = os.path.join(backup_dir, OBJECTS_DIR)
+        self.index_dir = os.path.join(backup_dir, INDEX_DIR)
+        self.retention = retention or DEFAULT_RETENTION
+        self.logger = logging.getLogger('BackupStore')
+        self.lock = threading.RLock()
+        self._stop = threading.Event()
+        self._pruner = None
+        self.catalog = {}  # 备份目录：数据文件 -> 版本列表（时间、哈希、大小），随备份写入同步更新
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.index_dir, exist_ok=True)
+
+    # --------------------- 路径 ---------------------
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def _index_path(self, filename: str) -> str:
+        return os.path.join(self.index_dir, f"{filename}.json")
+
+    # --------------------- 版本索引 ---------------------
+    def versions(self, filename: str) -> List[Dict]:
+        """返回某数据文件的全部备份版本（按时间升序）"""
+        with self.lock:
+            if filename not in self.catalog:
+                self.catalog[filename] = self._read_index(filename)
+            return [dict(v) for v in self.catalog[filename]]
+
+    def _read_index(self, filename: str) -> List[Dict]:
+        path = self._index_path(filename)
+        if not os.path.exists(path):
+            return []
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f).get("versions", [])
+        except (OSError, json.JSONDecodeError) as e:
+            self.logger.error(f"读取{filename}备份索引失败: {str(e)}")
+            return []
+
+    def _write_index(self, filename: str, versions: List[Dict]):
+        path = self._index_path(filename)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"file": filename, "versions": versions}, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+        self.catalog[filename] = [dict(v) for v in versions]
+
+    def indexed_files(self) -> List[str]:
+        return [name[:-len(".json")] for name in os.listdir(self.index_dir) if name.endswith(".json")]
+
+    # --------------------- 备份与读取 ---------------------
+    def backup(self, path: str) -> Optional[str]:
+        """备份文件，返回内容哈希；内容未变化时不产生新版本"""
+        filename = os.path.basename(path)
+        with self.lock:
+            stat = os.stat(path)
+            versions = self.versions(filename)
+            latest = versions[-1] if versions else None
+            # 大小和修改时间都没变，无需读取文件
+            if latest and latest.get("size") == stat.st_size and latest.get("mtime") == stat.st_mtime_ns:
+                return latest["hash"]
+
+            with open(path, "rb") as f:
+                data = f.read()
+            return self.add(filename, data, stat.st_mtime_ns)
+
+    def add(self, filename: str, data: bytes, mtime: Optional[int] = None) -> str:
+        """把一份内容记为filename的新版本（与最新版本相同时不产生新版本），返回内容哈希"""
+        with self.lock:
+            versions = self.versions(filename)
+            latest = versions[-1] if versions else None
+            digest = hashlib.sha256(data).hexdigest()
+            if latest and latest["hash"] == digest:
+                if mtime is not None and latest.get("mtime") != mtime:
+                    latest["mtime"] = mtime
+                    self._write_index(filename, versions)
+                return digest
+
+            self._store_blob(data, digest)
+            version = {"time": datetime.now().isoformat(), "hash": digest, "size": len(data)}
+            if mtime is not None:
+                version["mtime"] = mtime
+            versions.append(version)
+            self._write_index(filename, versions)
+            return digest
+
+    def _store_blob(self, data: bytes, digest: Optional[str] = None) -> str:
+        digest = digest or hashlib.sha256(data).hexdigest()
+        blob = self.blob_path(digest)
+        if not os.path.exists(blob):
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            temp_path = f"{blob}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, blob)
+        return digest
+
+    def read(self, digest: str) -> bytes:
+        with open(self.blob_path(digest), "rb") as f:
+            return f.read()
+
+    def read_verified(self, version: Dict) -> Optional[bytes]:
+        """读取版本内容并校验哈希，损坏或缺失时返回None"""
+        try:
+            data = self.read(version["hash"])
+        except OSError:
+            return None
+        if hashlib.sha256(data).hexdigest() != version["hash"]:
+            self.logger.warning(f"备份内容块{version['hash'][:12]}校验失败")
+            return None
+        return data
+
+    # --------------------- 恢复 ---------------------
+    def restore_latest(self, filename: str,
+                       validate: Optional[Callable[[bytes], bool]] = None) -> Optional[bytes]:
+        """返回最新一个通过校验的版本内容"""
+        return self._first_valid(reversed(self.versions(filename)), validate)
+
+    def _first_valid(self, versions, validate) -> Optional[bytes]:
+        for version in versions:
+            data = self.read_verified(version)
+            if data is None:
+                continue
+            if validate is None or validate(data):
+                return data
+        return None
+
+    # --------------------- 旧版备份导入 ---------------------
+    def import_legacy(self) -> int:
+        """把旧版 <文件名>.<时间戳>.bak 备份一次性导入仓库并删除原文件"""
+        imported = {}
+        with self.lock:
+            for name in os.listdir(self.backup_dir):
+                match = LEGACY_BACKUP.match(name)
+                if not match:
+                    continue
+                path = os.path.join(self.backup_dir, name)
+                try:
+                    with open(path, "rb") as f:
+                        data = f.read()
+                    stamp = datetime.strptime(match.group("stamp"), "%Y%m%d_%H%M%S")
+                    imported.setdefault(match.group("file"), []).append({
+                        "time": stamp.isoformat(),
+                        "hash": self._store_blob(data),
+                        "size": len(data)
+                    })
+                    os.remove(path)
+                except Exception as e:
+                    self.logger.error(f"导入旧版备份{name}失败: {str(e)}")
+            for filename, legacy in imported.items():
+                versions = self.versions(filename) + legacy
+                versions.sort(key=lambda v: v["time"])
+                self._write_index(filename, versions)
+        count = sum(len(v) for v in imported.values())
+        if count:
+            self.logger.info(f"已导入{count}个旧版备份")
+        return count
+
+    # --------------------- 保留策略 ---------------------
+    def _keep(self, versions: List[Dict], now: datetime) -> List[Dict]:
+        """按保留策略筛选版本，最新版本始终保留"""
+        kept = []
+        seen_buckets = set()
+        # 从新到旧遍历，每个分桶保留最新的一份
+        for version in reversed(versions):
+            age = now - datetime.fromisoformat(version["time"])
+            for tier, (limit, bucket) in enumerate(self.retention):
+                if age <= limit:
+                    if bucket is None:
+                        kept.append(version)
+                    else:
+                        key = (tier, int(age.total_seconds() // bucket.total_seconds()))
+                        if key not in seen_buckets:
+                            seen_buckets.add(key)
+                            kept.append(version)
+                    break
+        if versions and (not kept or kept[0] is not versions[-1]):
+            kept.insert(0, versions[-1])
+        return list(reversed(kept))
+
+    def prune(self, now: Optional[datetime] = None) -> int:
+        """执行保留策略并删除不再被引用的内容块，返回删除的块数量"""
+        now = now or datetime.now()
+        with self.lock:
+            referenced = set()
+            for filename in self.indexed_files():
+                versions = self.versions(filename)
+                kept = self._keep(versions, now)
+                if len(kept) != len(versions):
+                    self._write_index(filename, kept)
+                referenced.update(v["hash"] for v in kept)
+
+            removed = 0
+            for prefix in os.listdir(self.objects_dir):
+                prefix_dir = os.path.join(self.objects_dir, prefix)
+                if not os.path.isdir(prefix_dir):
+                    continue
+                for name in os.listdir(prefix_dir):
+                    if name not in referenced:
+                        os.remove(os.path.join(prefix_dir, name))
+                        removed += 1
+        if removed:
+            self.logger.info(f"备份清理完成，删除{removed}个过期内容块")
+        return removed
+
+    def start_pruner(self, interval: float = PRUNE_INTERVAL):
+        """启动后台清理线程"""
+        if self._pruner:
+            return
+
+        def run():
+            while True:
+                try:
+                    self.prune()
+                except Exception as e:
+                    self.logger.error(f"备份清理失败: {str(e)}")
+                if self._stop.wait(interval):
+                    break
+
+        self._pruner = threading.Thread(target=run, name="backup-pruner", daemon=True)
+        self._pruner.start()
+
+    def stop_pruner(self):
+        self._stop.set()
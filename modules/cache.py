@@ -0,0 +1,171 @@
+# cache.py
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+def byte_size(value: Any) -> int:
+    """估算缓存值占用的字节数"""
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    return len(str(value).encode("utf-8"))
+
+
+class LRUCache:
+    """按总字节数限制容量的LRU缓存（线程安全）"""
+
+    def __init__(self, max_bytes: int, sizeof: Optional[Callable[[Any], int]] = None):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof or byte_size
+        self.items = OrderedDict()  # 键 -> (值, 字节数)
+        self.total = 0
+        self.lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self.lock:
+            entry = self.items.get(key)
+            if entry is None:
+                return default
+            self.items.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any):
+        size = self.sizeof(value)
+        with self.lock:
+            old = self.items.pop(key, None)
+            if old is not None:
+                self.total -= old[1]
+            if size > self.max_bytes:
+                return  # 单个值超过上限时不缓存
+            self.items[key] = (value, size)
+            self.total += size
+            while self.total > self.max_bytes:
+                _, (_, evicted) = self.items.popitem(last=False)
+                self.total -= evicted
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self.lock:
+            entry = self.items.pop(key, None)
+            if entry is None:
+                return default
+            self.total -= entry[1]
+            return entry[0]
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+            self.total = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self.lock:
+            return key in self.items
+
+    def __len__(self) -> int:
+        with self.lock:
+            return len(self.items)
+
+
+class DiskCache:
+    """磁盘缓存：文件名为键（内容哈希），按总字节数LRU淘汰，可设置过期时间
+
+    文件的mtime记录写入时间（用于过期判断），atime记录最近一次命中（用于重启后恢复LRU顺序）。
+    """
+
+    def __init__(self, directory: str, max_bytes: int, ttl: Optional[float] = None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.logger = logging.getLogger('DiskCache')
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # 键 -> (字节数, 写入时间)，按最近访问排序
+        self.total = 0
+        os.makedirs(directory, exist_ok=True)
+        self._scan()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def _scan(self):
+        found = []
+        for prefix in os.listdir(self.directory):
+            prefix_dir = os.path.join(self.directory, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for name in os.listdir(prefix_dir):
+                if name.endswith(".tmp"):
+                    continue
+                stat = os.stat(os.path.join(prefix_dir, name))
+                found.append((stat.st_atime, name, stat.st_size, stat.st_mtime))
+        for _, key, size, created in sorted(found):
+            self.entries[key] = (size, created)
+            self.total += size
+        self._evict()
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def _remove(self, key: str):
+        size, _ = self.entries.pop(key)
+        self.total -= size
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _evict(self):
+        while self.total > self.max_bytes and self.entries:
+            self._remove(next(iter(self.entries)))
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry[1]):
+                self._remove(key)
+                return None
+            path = self._path(key)
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+                os.utime(path, (time.time(), entry[1]))  # 只更新访问时间，保留写入时间
+            except OSError as e:
+                self.logger.warning(f"读取缓存{key[:12]}失败: {str(e)}")
+                self._remove(key)
+                return None
+            self.entries.move_to_end(key)
+            return data
+
+    def put(self, key: str, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                temp_path = f"{path}.tmp"
+                with open(temp_path, "wb") as f:
+                    f.write(data)
+                os.replace(temp_path, path)
+            except OSError as e:
+                self.logger.error(f"写入缓存{key[:12]}失败: {str(e)}")
+                return
+            self.entries[key] = (len(data), time.time())
+            self.total += len(data)
+            self._evict()
+
+    def __contains__(self, key: str) -> bool:
+        with self.lock:
+            entry = self.entries.get(key)
+            return entry is not None and not self._expired(entry[1])
+
+    def __len__(self) -> int:
+        with self.lock:
+            return len(self.entries)
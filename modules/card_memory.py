@@ -1,17 +1,18 @@
 # card_memory.py
-import json
 from datetime import datetime, timedelta
 from PyQt5.QtWidgets import *
 from PyQt5.QtCore import *
 from PyQt5.QtGui import *
+from modules.data_manager import DataManager
 
-CARD_FILE = "data/card_data.json"
+CARD_DATASET = "cards"
 
 class CardMemoryModule(QWidget):
     data_updated = pyqtSignal()
 
-    def __init__(self, parent=None):
+    def __init__(self, data_manager=None, parent=None):
         super().__init__(parent)
+        self.data_manager = data_manager or DataManager()
         self.cards = []
         self.tags = []
         self.folders = ["默认文件夹"]
@@ -21,7 +22,8 @@ class CardMemoryModule(QWidget):
         self.load_data()
 
     class Card:
-        def __init__(self, title, answer, tags, folder, proficiency=0, last_practiced=None):
+        def __init__(self, title, answer, tags, folder, proficiency=0, last_practiced=None, id=None):
+            self.id = id
             self.title = title
             self.answer = answer
             self.tags = tags if isinstance(tags, list) else [tags]
@@ -44,6 +46,7 @@ class CardMemoryModule(QWidget):
 
         def to_dict(self):
             return {
+                'id': self.id,
                 'title': self.title,
                 'answer': self.answer,
                 'tags': self.tags,
@@ -60,7 +63,8 @@ class CardMemoryModule(QWidget):
                 data.get('tags', []),
                 data.get('folder', '默认文件夹'),
                 data.get('proficiency', 0),
-                datetime.fromisoformat(data['last_practiced'])
+                datetime.fromisoformat(data['last_practiced']),
+                data.get('id')
             )
 
     class CardWidget(QWidget):
@@ -219,7 +223,7 @@ class CardMemoryModule(QWidget):
             if self.current_index < len(self.cards):
                 self.show_card()
             else:
-                self.parent().save_data()  # 学习完成后自动保存
+                self.parent().save_cards(self.cards)  # 学习完成后自动保存
                 self.accept()
 
     def init_ui(self):
@@ -390,7 +394,7 @@ class CardMemoryModule(QWidget):
             if folder not in self.folders:
                 self.folders.append(folder)
                 self.folder_list.addItem(folder)
-                self.save_data()
+                self.save_meta()
 
     def create_tag(self):
         tag, ok = QInputDialog.getText(self, "新建标签", "输入标签名称:")
@@ -398,7 +402,7 @@ class CardMemoryModule(QWidget):
             if tag not in self.tags:
                 self.tags.append(tag)
                 self.tag_list.addItem(tag)
-                self.save_data()
+                self.save_meta()
 
     def filter_by_folder(self, item):
         self.current_folder = item.text()
@@ -448,34 +452,36 @@ class CardMemoryModule(QWidget):
                     proficiency=0
                 )
                 self.cards.append(new_card)
-                self.save_data()
+                self.save_cards([new_card])
                 self.update_card_display()
 
     def load_data(self):
-        try:
-            with open(CARD_FILE, "r") as f:
-                data = json.load(f)
-                self.tags = data.get('tags', [])
-                self.folders = data.get('folders', ["默认文件夹"])
-                self.cards = [self.Card.from_dict(c) for c in data.get('cards', [])]
-                self.folder_list.clear()
-                self.folder_list.addItems(self.folders)
-                self.tag_list.clear()
-                self.tag_list.addItems(self.tags)
-                self.update_card_display()
-        except FileNotFoundError:
-            pass
+        self.tags = self.data_manager.get_value("card_tags", [])
+        self.folders = self.data_manager.get_value("card_folders", ["默认文件夹"])
+        self.cards = [self.Card.from_dict(c) for c in self.data_manager.load_records(CARD_DATASET)]
+        self.folder_list.clear()
+        self.folder_list.addItems(self.folders)
+        self.tag_list.clear()
+        self.tag_list.addItems(self.tags)
+        self.update_card_display()
 
-    def save_data(self):
-        data = {
-            'tags': self.tags,
-            'folders': self.folders,
-            'cards': [c.to_dict() for c in self.cards]
-        }
-        with open(CARD_FILE, "w") as f:
-            json.dump(data, f, indent=2)
+    def save_cards(self, cards):
+        """只保存指定的卡片（新建、编辑、学习后）"""
+        records = [c.to_dict() for c in cards]
+        self.data_manager.save_records(CARD_DATASET, records)
+        for card, record in zip(cards, records):
+            card.id = record['id']
         self.data_updated.emit()
 
+    def save_meta(self):
+        """保存文件夹与标签列表"""
+        self.data_manager.set_value("card_tags", self.tags)
+        self.data_manager.set_value("card_folders", self.folders)
+
+    def save_data(self):
+        self.save_meta()
+        self.save_cards(self.cards)
+
     # 其余方法保持不变（update_card_display, preview_card等）
     # ...（保持原有方法实现不变）
     def preview_card(self, card):
@@ -505,7 +511,7 @@ class CardMemoryModule(QWidget):
             card.answer = new_data['answer']
             card.tags = new_data['tags']
             card.folder = new_data['folder']
-            self.save_data()
+            self.save_cards([card])
             self.update_card_display()
 
     def delete_card(self, card):
@@ -516,7 +522,8 @@ class CardMemoryModule(QWidget):
         )
         if confirm == QMessageBox.Yes:
             self.cards.remove(card)
-            self.save_data()
+            self.data_manager.delete_record(CARD_DATASET, card.id)
+            self.data_updated.emit()
             self.update_card_display()
 
     def start_study(self):
@@ -544,7 +551,7 @@ class CardMemoryModule(QWidget):
             
         study_dialog = self.StudyDialog(to_study, self)
         study_dialog.exec_()
-        self.save_data()
+        self.save_cards(filtered)  # 衰减与练习结果一并保存
 
     def resizeEvent(self, event):
         self.update_card_display()
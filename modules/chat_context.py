@@ -0,0 +1,88 @@
+# chat_context.py
+import re
+from typing import Dict, List, Tuple
+
+from modules.cache import LRUCache
+
+CONTEXT_TOKEN_BUDGET = 3000   # 每次请求发送的上下文token上限
+SUMMARY_SHARE = 0.25          # 摘要最多占用预算的比例
+MESSAGE_OVERHEAD = 4          # 每条消息的角色、分隔符等开销
+TOKEN_CACHE_ENTRIES = 10000
+
+CJK_RE = re.compile("[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff\u3000-\u303f\uff00-\uffef]")
+
+SUMMARY_PROMPT = ("请把以下对话压缩为不超过300字的摘要，保留讨论的主题、已得出的结论和尚未解决的问题。"
+                  "如果提供了之前的摘要，请在其基础上合并更新。")
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算token数：中日韩字符约1个token，其余约4个字符1个token"""
+    cjk = len(CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+class ContextBuilder:
+    """按token预算从新到旧挑选消息，更早的对话由会话中保存的滚动摘要代替"""
+
+    def __init__(self, budget: int = CONTEXT_TOKEN_BUDGET):
+        self.budget = budget
+        # 内容 -> token数；消息内容不变，重复构建上下文时直接命中
+        self.token_cache = LRUCache(TOKEN_CACHE_ENTRIES, sizeof=lambda _: 1)
+
+    def count(self, text: str) -> int:
+        tokens = self.token_cache.get(text)
+        if tokens is None:
+            tokens = estimate_tokens(text) + MESSAGE_OVERHEAD
+            self.token_cache.put(text, tokens)
+        return tokens
+
+    def window_start(self, history: List[Dict], reserved: int = 0) -> int:
+        """预算内能放下的最早一条消息的下标；最新一条消息总会发送"""
+        used = reserved
+        start = len(history)
+        for i in range(len(history) - 1, -1, -1):
+            tokens = self.count(history[i]["content"])
+            if used + tokens > self.budget and start < len(history):
+                break
+            used += tokens
+            start = i
+        return start
+
+    def summary_reserve(self, summary: Dict) -> int:
+        if not summary.get("text"):
+            return 0
+        return min(self.count(summary["text"]), int(self.budget * SUMMARY_SHARE))
+
+    def build(self, session: Dict) -> List[Dict]:
+        """生成发送给接口的消息列表（只含role和content）"""
+        history = session.get("history", [])
+        summary = session.get("summary") or {}
+        reserve = self.summary_reserve(summary)
+        start = self.window_start(history, reserve)
+        messages = []
+        if start > 0 and summary.get("text"):
+            text = summary["text"]
+            tokens = self.count(text)
+            if tokens > reserve:
+                text = text[:len(text) * reserve // tokens]  # 超长摘要按比例截断
+            messages.append({"role": "system", "content": f"之前对话的摘要：{text}"})
+        messages.extend({"role": m["role"], "content": m["content"]} for m in history[start:])
+        return messages
+
+    def pending_summary(self, session: Dict) -> Tuple[int, int]:
+        """返回需要并入摘要的消息范围 (起, 止)；无需更新时起止相同"""
+        history = session.get("history", [])
+        summary = session.get("summary") or {}
+        covered = summary.get("upto", 0)
+        # 按最大摘要占用计算窗口，保证摘要变长后窗口之外的消息都已被摘要覆盖
+        start = self.window_start(history, int(self.budget * SUMMARY_SHARE))
+        return covered, max(covered, start)
+
+    def summary_request(self, session: Dict, start: int, end: int) -> List[Dict]:
+        """生成更新摘要的请求消息"""
+        summary = session.get("summary") or {}
+        dialogue = "\n".join(f"{m['role']}: {m['content']}" for m in session["history"][start:end])
+        if summary.get("text"):
+            dialogue = f"之前的摘要：{summary['text']}\n\n新的对话：\n{dialogue}"
+        return [{"role": "system", "content": SUMMARY_PROMPT},
+                {"role": "user", "content": dialogue}]
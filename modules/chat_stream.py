@@ -0,0 +1,176 @@
+# chat_stream.py
+import json
+import time
+import hashlib
+import logging
+import threading
+from typing import Callable, Dict, List
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+API_URL = "https://api.deepseek.com/v1/chat/completions"
+DEFAULT_MODEL = "deepseek-chat"
+CONNECT_TIMEOUT = 5       # 建立连接的超时（秒）
+READ_TIMEOUT = 60         # 两次收到数据之间的最长等待（秒），不限制整个流的时长
+POOL_SIZE = 4             # 连接池大小
+WARM_UP_INTERVAL = 30     # 两次预热之间的最短间隔（秒）
+RESPONSE_CACHE_DIR = "response_cache"
+RESPONSE_CACHE_BYTES = 50 * 1024 * 1024   # 回复缓存总大小上限
+RESPONSE_CACHE_TTL = 7 * 24 * 3600        # 回复缓存有效期（秒）
+COALESCE_INTERVAL = 0.05  # 合并窗口（秒）
+COALESCE_BYTES = 512      # 缓冲达到该字节数时立即发出
+
+
+def cache_key(model: str, messages: List[Dict]) -> str:
+    """回复缓存的键：模型与请求消息的SHA-256"""
+    payload = json.dumps({"model": model, "messages": messages},
+                         ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SSEParser:
+    """增量解析SSE字节流，按事件返回data字段内容（bytes）"""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.data = []  # 当前事件已收到的data行
+
+    def feed(self, chunk: bytes) -> List[bytes]:
+        self.buffer += chunk
+        events = []
+        start = 0
+        while True:
+            end = self.buffer.find(b"\n", start)
+            if end < 0:
+                break
+            line = bytes(self.buffer[start:end]).rstrip(b"\r")
+            start = end + 1
+            if not line:
+                # 空行表示事件结束
+                if self.data:
+                    events.append(b"\n".join(self.data))
+                    self.data = []
+            elif line.startswith(b"data:"):
+                value = line[5:]
+                self.data.append(value[1:] if value.startswith(b" ") else value)
+            # event/id/retry字段和注释行不需要处理
+        del self.buffer[:start]
+        return events
+
+    def close(self) -> List[bytes]:
+        """流结束时返回未以空行结尾的最后一个事件"""
+        events = self.feed(b"\n\n") if self.buffer or self.data else []
+        self.buffer.clear()
+        return events
+
+
+class ChunkCoalescer:
+    """合并细碎的流式增量：距上次发出超过interval秒或缓冲超过max_bytes时发出；
+    上游停顿时缓冲的内容也会在interval秒内由定时器发出"""
+
+    def __init__(self, emit: Callable[[str], None],
+                 interval: float = COALESCE_INTERVAL, max_bytes: int = COALESCE_BYTES):
+        self.emit = emit
+        self.interval = interval
+        self.max_bytes = max_bytes
+        self.parts = []
+        self.size = 0
+        self.last_emit = 0.0
+        self.lock = threading.Lock()  # 定时器线程与读取线程都会发出
+        self.timer = None
+
+    def add(self, text: str):
+        with self.lock:
+            self.parts.append(text)
+            self.size += len(text.encode("utf-8"))
+            wait = self.interval - (time.monotonic() - self.last_emit)
+            if self.size >= self.max_bytes or wait <= 0:
+                self._flush()
+            elif self.timer is None:
+                self.timer = threading.Timer(wait, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def discard(self):
+        """丢弃缓冲内容并取消定时发出（出错时使用）"""
+        with self.lock:
+            self._cancel_timer()
+            self.parts = []
+            self.size = 0
+
+    def _cancel_timer(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+    def _flush(self):
+        self._cancel_timer()
+        if self.parts:
+            self.emit("".join(self.parts))
+            self.parts = []
+            self.size = 0
+        self.last_emit = time.monotonic()
+
+
+class ChatClient:
+    """长期复用的聊天接口客户端：连接池 + keep-alive，连接与读取分别设置超时"""
+
+    def __init__(self, api_url: str = API_URL, model: str = DEFAULT_MODEL,
+                 connect_timeout: float = CONNECT_TIMEOUT, read_timeout: float = READ_TIMEOUT,
+                 pool_size: int = POOL_SIZE):
+        self.api_url = api_url
+        self.model = model
+        self.timeout = (connect_timeout, read_timeout)
+        self.logger = logging.getLogger('ChatClient')
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.last_warm_up = 0.0
+
+    def stream(self, api_key: str, messages: List[Dict]) -> requests.Response:
+        """发起流式请求，返回的响应需在with语句中使用以便连接归还连接池"""
+        return self.session.post(
+            self.api_url,
+            headers={"Authorization": f"Bearer {api_key.strip()}"},
+            json={"messages": messages, "model": self.model, "stream": True},
+            stream=True,
+            timeout=self.timeout
+        )
+
+    def complete(self, api_key: str, messages: List[Dict]) -> str:
+        """非流式请求，返回完整回复文本（用于后台生成摘要等）"""
+        with self.session.post(
+            self.api_url,
+            headers={"Authorization": f"Bearer {api_key.strip()}"},
+            json={"messages": messages, "model": self.model, "stream": False},
+            timeout=self.timeout
+        ) as response:
+            response.raise_for_status()
+            return response.json()["choices"][0]["message"]["content"]
+
+    def warm_up(self):
+        """在后台提前建立连接（DNS、TCP、TLS），之后的请求直接复用"""
+        now = time.monotonic()
+        if now - self.last_warm_up < WARM_UP_INTERVAL:
+            return
+        self.last_warm_up = now
+        parts = urlsplit(self.api_url)
+        origin = f"{parts.scheme}://{parts.netloc}/"
+
+        def run():
+            try:
+                self.session.head(origin, timeout=self.timeout[0])
+            except requests.RequestException as e:
+                self.logger.info(f"连接预热失败: {str(e)}")
+
+        threading.Thread(target=run, name="chat-warm-up", daemon=True).start()
+
+    def close(self):
+        self.session.close()
@@ -1,30 +1,291 @@
 # data_manager.py
 import os
-import json
+import copy
 import logging
-from datetime import datetime
-from typing import Any, Dict, Optional
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from modules.storage import SQLiteStore, DB_FILE, TABLES
+from modules.journal import JournalStore, JOURNAL_DIR
+from modules.write_queue import WriteBehindQueue, DEFAULT_DELAY
+from modules.backup_store import BackupStore
+from modules import serializers
+from modules.schema import Schema, SCHEMAS
+from modules.text_index import TextIndex, INDEX_VERSION
+
+# 各数据文件的默认序列化格式；需要手动编辑的settings.json保持缩进
+DEFAULT_FORMATS = {"settings.json": "json-pretty"}
+DB_BACKUP_INTERVAL = 600  # 数据库快照间隔（秒），数据库没有变化时不做快照
 
 class DataManager:
-    def __init__(self):
+    def __init__(self, journal_datasets: Optional[List[str]] = None,
+                 write_delay: float = DEFAULT_DELAY,
+                 formats: Optional[Dict[str, str]] = None):
         self.data_dir = "data"
         self.backup_dir = os.path.join(self.data_dir, "backups")
         self._ensure_directories()
         self.logger = logging.getLogger('DataManager')
+        # 每个数据文件可单独指定序列化格式（json / orjson / msgpack）
+        self.formats = serializers.resolve_formats({**DEFAULT_FORMATS, **(formats or {})})
+        # 内容寻址备份仓库，后台按保留策略清理
+        self.backups = BackupStore(self.backup_dir)
+        self.backups.import_legacy()
+        self.backups.start_pruner()
+        # 各模块数据统一存放在SQLite数据库中
+        self.store = SQLiteStore(os.path.join(self.data_dir, DB_FILE))
+        self.store.migrate_json(self.data_dir)
+        # 可选的日志模式：指定的数据集改为追加式日志存储
+        self.journal = JournalStore(os.path.join(self.data_dir, JOURNAL_DIR),
+                                    serializer=self.formats.get("journal"))
+        self.journal_datasets = set(journal_datasets or [])
+        for dataset in TABLES:
+            if dataset in self.journal_datasets:
+                self._seed_journal(dataset)
+            else:
+                self._unseed_journal(dataset)
+        # 后台写入队列：同一批次在一个事务中提交
+        self.writer = WriteBehindQueue(write_delay, batch_context=self.store.transaction)
+        self.indexes = {}  # 全文索引名 -> TextIndex
+        # 数据库定期快照到备份仓库，由仓库的保留策略统一清理
+        self._db_backup_changes = None  # 上次快照时数据库的修改计数
+        self._db_backup_lock = threading.Lock()
+        self._db_backup_stop = threading.Event()
+        self._db_backup_thread = None
+        self.start_db_backups()
+
+    def _seed_journal(self, dataset: str):
+        """首次启用日志模式时，从数据库导入已有记录作为初始状态"""
+        if self.journal.is_empty(dataset):
+            self.journal.replace_all(dataset, self.store.load_all(dataset))
+            self.journal.compact(dataset)
+
+    def _unseed_journal(self, dataset: str):
+        """关闭日志模式后，把日志中的最新状态写回数据库，再删除日志，避免读到过期数据"""
+        if not self.journal.is_empty(dataset):
+            self.store.replace_all(dataset, self.journal.load_all(dataset))
+            self.journal.drop(dataset)
+            self.logger.info(f"{dataset}已关闭日志模式，数据已写回数据库")
+
+    def _backend(self, dataset: str):
+        return self.journal if dataset in self.journal_datasets else self.store
 
     def _ensure_directories(self):
         """确保所有数据目录存在"""
         os.makedirs(self.data_dir, exist_ok=True)
         os.makedirs(self.backup_dir, exist_ok=True)
 
+    # --------------------- 数据集记录操作 ---------------------
+    def _needs_id(self, dataset: str, record: Dict) -> bool:
+        """自增主键的新记录需要同步插入以立即拿到ID"""
+        return TABLES[dataset]["auto_id"] and record.get("id") is None
+
+    def load_records(self, dataset: str) -> List[Dict]:
+        """加载数据集的全部记录；结构版本已是最新时不做逐条校验"""
+        self._flush_dataset(dataset)  # 先写出该数据集的待写记录，保证读到最新状态
+        try:
+            records = self._backend(dataset).load_all(dataset)
+            schema = SCHEMAS.get(dataset)
+            if schema and self.schema_version(dataset) != schema.version:
+                records = self._upgrade(dataset, schema, records)
+            return records
+        except Exception as e:
+            self.logger.error(f"加载数据集{dataset}失败: {str(e)}")
+            return []
+
+    def load_index(self, dataset: str) -> List[Dict]:
+        """只加载数据集的索引列（如会话列表不含消息历史）"""
+        schema = SCHEMAS.get(dataset)
+        if schema and self.schema_version(dataset) != schema.version:
+            self.load_records(dataset)  # 结构升级需要完整记录，只在首次升级时发生
+        self._flush_dataset(dataset)
+        try:
+            return self._backend(dataset).load_index(dataset)
+        except Exception as e:
+            self.logger.error(f"加载{dataset}索引失败: {str(e)}")
+            return []
+
+    def load_record(self, dataset: str, key: Any) -> Optional[Dict]:
+        """按主键加载单条完整记录"""
+        self._flush_keys(lambda k: k == (dataset, key))
+        try:
+            return self._backend(dataset).load_one(dataset, key)
+        except Exception as e:
+            self.logger.error(f"加载{dataset}记录{key}失败: {str(e)}")
+            return None
+
+    def schema_version(self, dataset: str) -> int:
+        """数据集当前的结构版本，未标记时为0"""
+        return self.store.get_value(f"schema_version:{dataset}", 0)
+
+    def _upgrade(self, dataset: str, schema: Schema, records: List[Dict]) -> List[Dict]:
+        """一次性迁移并校验整个数据集，结果写回存储并记录版本号；无效记录移入隔离区而不删除"""
+        from_version = self.schema_version(dataset)
+        valid, invalid = schema.upgrade(records, from_version)
+        backend = self._backend(dataset)
+        if invalid:
+            # 先单独提交隔离区，之后再从数据集中移除，中途退出也不会丢失记录
+            quarantine = self.store.get_value(f"quarantine:{dataset}", [])
+            self.store.set_value(f"quarantine:{dataset}", quarantine + invalid)
+        with self.store.transaction():
+            for record in invalid:
+                self.logger.warning(f"{dataset}中无效的记录已移入隔离区: {record}")
+                if record.get("id") is not None:
+                    backend.delete(dataset, record["id"])
+            backend.upsert_many(dataset, valid)
+            self.store.set_value(f"schema_version:{dataset}", schema.version)
+        self.logger.info(f"{dataset}结构已从版本{from_version}升级到{schema.version}")
+        return valid
+
+    def save_record(self, dataset: str, record: Dict) -> Any:
+        """保存单条记录（一次UPDATE/INSERT），返回主键；已有主键的记录在后台写入"""
+        if not self._needs_id(dataset, record):
+            snapshot = copy.deepcopy(record)
+            self.writer.submit(
+                (dataset, record["id"]),
+                lambda: self._backend(dataset).upsert(dataset, snapshot))
+            return record["id"]
+        try:
+            record_id = self._backend(dataset).upsert(dataset, record)
+            record["id"] = record_id
+            return record_id
+        except Exception as e:
+            self.logger.error(f"保存{dataset}记录失败: {str(e)}")
+            return None
+
+    def save_records(self, dataset: str, records: List[Dict]) -> bool:
+        """批量保存多条记录"""
+        if any(self._needs_id(dataset, r) for r in records):
+            try:
+                self._backend(dataset).upsert_many(dataset, records)
+                return True
+            except Exception as e:
+                self.logger.error(f"批量保存{dataset}失败: {str(e)}")
+                return False
+        for record in records:
+            self.save_record(dataset, record)
+        return True
+
+    def delete_record(self, dataset: str, key: Any) -> bool:
+        """删除单条记录"""
+        self.writer.submit((dataset, key), lambda: self._backend(dataset).delete(dataset, key))
+        return True
+
+    def get_value(self, key: str, default: Any = None) -> Any:
+        """读取键值配置（如卡片文件夹列表）"""
+        self._flush_keys(lambda k: k == ("kv", key))
+        try:
+            return self.store.get_value(key, default)
+        except Exception as e:
+            self.logger.error(f"读取{key}失败: {str(e)}")
+            return default
+
+    def set_value(self, key: str, value: Any):
+        """写入键值配置（后台写入）"""
+        snapshot = copy.deepcopy(value)
+        self.writer.submit(("kv", key), lambda: self.store.set_value(key, snapshot))
+
+    # --------------------- 全文索引 ---------------------
+    def text_index(self, name: str) -> TextIndex:
+        if name not in self.indexes:
+            self.indexes[name] = TextIndex(self.store, name)
+        return self.indexes[name]
+
+    def ensure_index(self, name: str, documents: Callable[[], Iterable[Tuple[Any, str]]]):
+        """索引不存在或分词规则已变化时，在单独的线程中用documents()重建
+
+        不经过写入队列：读取其他数据时的flush()不必等待整个重建完成。
+        """
+        if self.get_value(f"text_index:{name}") == INDEX_VERSION:
+            return
+        index = self.text_index(name)
+
+        def build():
+            try:
+                index.rebuild(documents)
+                self.store.set_value(f"text_index:{name}", INDEX_VERSION)
+                self.logger.info(f"全文索引{name}已重建")
+            except Exception as e:
+                self.logger.error(f"重建全文索引{name}失败: {str(e)}")
+
+        threading.Thread(target=build, name=f"index-{name}", daemon=True).start()
+
+    def index_document(self, name: str, doc: Any, text: str):
+        """在后台更新单篇文档的索引"""
+        index = self.text_index(name)
+        self.writer.submit(("index", name, doc), lambda: index.add(doc, text))
+
+    def unindex_document(self, name: str, doc: Any):
+        index = self.text_index(name)
+        self.writer.submit(("index", name, doc), lambda: index.remove(doc))
+
+    def search_text(self, name: str, query: str, limit: int = 20) -> List[Tuple[Any, float]]:
+        """全文检索，返回按相关度排序的 (文档ID, 得分)"""
+        self._flush_keys(lambda k: k[0] == "index" and k[1] == name)
+        try:
+            return self.text_index(name).search(query, limit)
+        except Exception as e:
+            self.logger.error(f"全文检索{name}失败: {str(e)}")
+            return []
+
+    # --------------------- 后台写入 ---------------------
+    def schedule_save(self, filename: str, data: Any, backup: bool = True):
+        """在后台安全保存JSON文件，窗口内的重复保存会被合并"""
+        snapshot = copy.deepcopy(data)
+        self.writer.submit(("file", filename), lambda: self.safe_save(filename, snapshot, backup))
+
+    def write_text(self, path: str, text: str, on_written: Optional[Callable[[], None]] = None):
+        """在后台原子写入文本文件（先写临时文件再替换），写完后在写入线程中回调on_written"""
+        self.writer.submit(("text", path), lambda: self._atomic_write(path, text, on_written))
+
+    def delete_file(self, path: str, on_deleted: Optional[Callable[[], None]] = None):
+        """在后台删除文件，与write_text使用同一个键，会替换该文件尚未执行的写入"""
+        def remove():
+            if os.path.exists(path):
+                os.remove(path)
+            if on_deleted:
+                on_deleted()
+
+        self.writer.submit(("text", path), remove)
+
+    def _atomic_write(self, path: str, text: str, on_written: Optional[Callable[[], None]] = None):
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(temp_path, path)
+        if on_written:
+            on_written()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """等待所有待写数据落盘"""
+        return self.writer.flush(timeout)
+
+    def _flush_keys(self, predicate: Callable[[Any], bool]):
+        """读取前只写出与读取内容相关的待写任务，不等待其他键"""
+        self.writer.flush_matching(predicate)
+
+    def _flush_dataset(self, dataset: str):
+        self._flush_keys(lambda k: k[0] == dataset)
+
+    def close(self):
+        """写完剩余数据、做最后一次数据库快照并关闭数据库连接"""
+        self.writer.stop()
+        self._db_backup_stop.set()
+        if self._db_backup_thread:
+            self._db_backup_thread.join()
+        self.backup_database()
+        self.backups.stop_pruner()
+        self.store.close()
+
+    # --------------------- JSON文件读写 ---------------------
     def safe_save(self, filename: str, data: Any, backup: bool = True) -> bool:
         """安全保存数据文件"""
         path = os.path.join(self.data_dir, filename)
+        temp_path = f"{path}.tmp"
         try:
             # 先保存到临时文件
-            temp_path = f"{path}.tmp"
-            with open(temp_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            serializer = self.formats.get(filename, serializers.get_serializer(serializers.DEFAULT_FORMAT))
+            with open(temp_path, 'wb') as f:
+                f.write(serializer.dumps(data))
             
             # 替换原文件
             if os.path.exists(path):
@@ -46,13 +307,14 @@ class DataManager:
             if not os.path.exists(path):
                 return default
                 
-            with open(path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            with open(path, 'rb') as f:
+                # 自动识别JSON或msgpack
+                data = serializers.loads(f.read())
                 # 验证基本数据完整性
                 if not isinstance(data, (dict, list)):
                     raise ValueError("Invalid data format")
                 return data
-        except (json.JSONDecodeError, ValueError) as e:
+        except (ValueError, TypeError) as e:
             self.logger.warning(f"数据文件{filename}损坏，尝试恢复备份")
             return self._restore_backup(filename, default)
         except Exception as e:
@@ -60,36 +322,74 @@ class DataManager:
             return default
 
     def _create_backup(self, original_path: str):
-        """创建备份文件"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_name = f"{os.path.basename(original_path)}.{timestamp}.bak"
-        backup_path = os.path.join(self.backup_dir, backup_name)
+        """创建备份（内容未变化时不占用额外空间）"""
         try:
-            with open(original_path, 'rb') as src, open(backup_path, 'wb') as dst:
-                dst.write(src.read())
+            self.backups.backup(original_path)
         except Exception as e:
             self.logger.error(f"创建备份失败: {str(e)}")
 
+    def backup_database(self) -> Optional[str]:
+        """把数据库的一致快照存入备份仓库，返回内容哈希；自上次快照以来没有修改时跳过"""
+        with self._db_backup_lock:
+            changes = self.store.changes()
+            if changes == self._db_backup_changes:
+                return None
+            temp_path = os.path.join(self.backup_dir, f"{DB_FILE}.tmp")
+            try:
+                self.store.snapshot(temp_path)
+                with open(temp_path, "rb") as f:
+                    digest = self.backups.add(DB_FILE, f.read())
+                self._db_backup_changes = changes
+                return digest
+            except Exception as e:
+                self.logger.error(f"数据库快照失败: {str(e)}")
+                return None
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+
+    def start_db_backups(self, interval: float = DB_BACKUP_INTERVAL):
+        """启动后台线程：启动时和之后每隔interval秒做一次数据库快照"""
+        if self._db_backup_thread:
+            return
+
+        def run():
+            while True:
+                self.backup_database()
+                if self._db_backup_stop.wait(interval):
+                    break
+
+        self._db_backup_thread = threading.Thread(target=run, name="db-backup", daemon=True)
+        self._db_backup_thread.start()
+
     def _restore_backup(self, filename: str, default: Any) -> Any:
-        """尝试恢复备份"""
+        """尝试恢复最新一个能正常解析的备份"""
         try:
-            backups = sorted(
-                [f for f in os.listdir(self.backup_dir) if f.startswith(filename)],
-                reverse=True
-            )
-            if backups:
-                latest_backup = os.path.join(self.backup_dir, backups[0])
-                with open(latest_backup, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+            data = self.backups.restore_latest(filename, self._is_valid_data)
+            if data is not None:
+                return serializers.loads(data)
         except Exception as e:
             self.logger.error(f"恢复备份失败: {str(e)}")
         
         self.logger.info(f"使用默认数据恢复{filename}")
         return default
 
-    def validate_data_structure(self, data: Any, schema: Dict) -> bool:
+    def _is_valid_data(self, data: bytes) -> bool:
+        try:
+            return isinstance(serializers.loads(data), (dict, list))
+        except (ValueError, TypeError):
+            return False
+
+    def validate_data_structure(self, data: Any, schema: Any) -> bool:
         """验证数据结构是否符合预期"""
-        # 可根据具体需求实现详细的数据结构验证
+        if isinstance(schema, Schema):
+            records = data if isinstance(data, list) else [data]
+            try:
+                for record in records:
+                    schema.validate(dict(record))
+                return True
+            except (ValueError, TypeError):
+                return False
         if not isinstance(data, type(schema)):
             return False
         if isinstance(data, dict):
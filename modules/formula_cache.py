@@ -0,0 +1,112 @@
+# formula_cache.py
+"""LaTeX公式的SVG缓存：页面用MathJax排版新公式后把SVG交回Python保存（内存 + 磁盘），
+之后渲染HTML时直接嵌入已缓存的SVG，MathJax只处理没见过的公式。"""
+import re
+from typing import Optional
+
+from PyQt5.QtCore import QObject, QFile, QIODevice, pyqtSlot
+from PyQt5.QtWebChannel import QWebChannel
+
+from modules.cache import LRUCache, DiskCache
+
+FORMULA_CACHE_DIR = "formula_cache"
+FORMULA_MEMORY_BYTES = 8 * 1024 * 1024
+FORMULA_DISK_BYTES = 50 * 1024 * 1024
+MAX_SVG_BYTES = 256 * 1024  # 单个公式SVG的上限，超过不缓存
+
+# render_markdown输出的公式（键见markdown_render.formula_key）：<span class="tex" data-key="...">转义后的TeX源码</span>
+FORMULA_SPAN_RE = re.compile(r'<span class="tex" data-key="([0-9a-f]{64})">(.*?)</span>', re.DOTALL)
+KEY_RE = re.compile(r"^[0-9a-f]{64}$")
+
+# 页面端：排版完成后收集新公式的SVG交给formulas对象保存
+FORMULA_JS = """
+const formulas = {
+    bridge: null,
+    init() {
+        if (window.qt && window.QWebChannel) {
+            new QWebChannel(qt.webChannelTransport, channel => { this.bridge = channel.objects.formulas; });
+        }
+    },
+    typeset(nodes) {
+        if (!(window.MathJax && MathJax.typesetPromise)) return Promise.resolve();
+        return MathJax.typesetPromise(nodes).then(() => this.collect(nodes)).catch(() => {});
+    },
+    collect(nodes) {
+        if (!this.bridge) return;
+        for (const node of nodes) {
+            node.querySelectorAll('span.tex:not(.tex2jax_ignore)').forEach(span => {
+                const svg = span.querySelector('mjx-container');
+                if (!svg) return;
+                span.classList.add('tex2jax_ignore');
+                this.bridge.store(span.dataset.key, span.innerHTML);
+            });
+        }
+    }
+};
+formulas.init();
+"""
+
+def formula_scripts() -> str:
+    """页面中需要的脚本：Qt自带的qwebchannel.js和FORMULA_JS"""
+    source = QFile(":/qtwebchannel/qwebchannel.js")
+    channel_js = ""
+    if source.open(QIODevice.ReadOnly):
+        channel_js = bytes(source.readAll()).decode("utf-8")
+        source.close()
+    return f"<script>{channel_js}</script>\n<script>{FORMULA_JS}</script>"
+
+
+class FormulaCache:
+    """公式键 -> MathJax输出的SVG，内存LRU在前，磁盘缓存在后"""
+
+    def __init__(self, disk_dir: Optional[str] = None,
+                 memory_bytes: int = FORMULA_MEMORY_BYTES, disk_bytes: int = FORMULA_DISK_BYTES):
+        self.memory = LRUCache(memory_bytes)
+        self.disk = DiskCache(disk_dir, disk_bytes) if disk_dir else None
+
+    def get(self, key: str) -> Optional[str]:
+        svg = self.memory.get(key)
+        if svg is None and self.disk is not None:
+            data = self.disk.get(key)
+            if data is not None:
+                svg = data.decode("utf-8")
+                self.memory.put(key, svg)
+        return svg
+
+    def put(self, key: str, svg: str):
+        if not KEY_RE.match(key) or len(svg) > MAX_SVG_BYTES or key in self.memory:
+            return
+        self.memory.put(key, svg)
+        if self.disk is not None:
+            self.disk.put(key, svg.encode("utf-8"))
+
+    def inject(self, html: str) -> str:
+        """把已缓存的公式替换为SVG，并标记为MathJax忽略"""
+        def replace(match):
+            svg = self.get(match.group(1))
+            if svg is None:
+                return match.group()
+            return f'<span class="tex tex2jax_ignore" data-key="{match.group(1)}">{svg}</span>'
+
+        return FORMULA_SPAN_RE.sub(replace, html)
+
+
+class FormulaBridge(QObject):
+    """通过QWebChannel暴露给页面的对象（页面中为 channel.objects.formulas）"""
+
+    def __init__(self, cache: FormulaCache, parent=None):
+        super().__init__(parent)
+        self.cache = cache
+
+    @pyqtSlot(str, str)
+    def store(self, key, svg):
+        self.cache.put(key, svg)
+
+
+def attach_formula_cache(view, cache: FormulaCache) -> FormulaBridge:
+    """在QWebEngineView的页面上注册formulas对象（需在setHtml之前调用）"""
+    bridge = FormulaBridge(cache, view)
+    channel = QWebChannel(view.page())
+    channel.registerObject("formulas", bridge)
+    view.page().setWebChannel(channel)
+    return bridge
@@ -0,0 +1,195 @@
+# journal.py
+import os
+import json
+import logging
+import threading
+from typing import Any, Dict, List, Tuple
+
+from modules.storage import TABLES, index_columns
+from modules import serializers
+
+JOURNAL_DIR = "journal"
+COMPACT_THRESHOLD = 1024 * 1024  # 日志超过1MB时合并为新快照
+
+
+def sort_key(value: Any) -> Tuple:
+    """与SQLite的ORDER BY一致：NULL在前，其次数字，再次字符串；不同类型之间不直接比较"""
+    if value is None:
+        return (0, 0)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value)
+    return (3, str(value))
+
+
+class JournalStore:
+    """追加式日志存储：每次变更追加一行JSON，加载时在快照上重放日志"""
+
+    def __init__(self, journal_dir: str, compact_threshold: int = COMPACT_THRESHOLD,
+                 serializer=None):
+        self.journal_dir = journal_dir
+        self.serializer = serializer or serializers.get_serializer(serializers.DEFAULT_FORMAT)  # 快照格式
+        self.compact_threshold = compact_threshold
+        self.logger = logging.getLogger('JournalStore')
+        self.lock = threading.RLock()
+        self.states = {}     # 数据集 -> {id: record}
+        self.log_sizes = {}  # 数据集 -> 当前日志字节数
+        self.max_ids = {}    # 数据集 -> 已分配过的最大整数ID（删除后不复用，与SQLite的AUTOINCREMENT一致）
+        os.makedirs(journal_dir, exist_ok=True)
+
+    def _snapshot_path(self, dataset: str) -> str:
+        return os.path.join(self.journal_dir, f"{dataset}.snapshot.json")
+
+    def _log_path(self, dataset: str) -> str:
+        return os.path.join(self.journal_dir, f"{dataset}.log.jsonl")
+
+    # --------------------- 加载与重放 ---------------------
+    def _state(self, dataset: str) -> Dict:
+        """返回数据集的内存状态，首次访问时从快照+日志重建"""
+        if dataset not in self.states:
+            self.states[dataset] = self._replay(dataset)
+        return self.states[dataset]
+
+    def _replay(self, dataset: str) -> Dict:
+        state = {}
+        self.max_ids[dataset] = 0
+        snapshot_path = self._snapshot_path(dataset)
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path, "rb") as f:
+                snapshot = serializers.loads(f.read())
+            for record in snapshot.get("records", []):
+                state[record["id"]] = record
+                self._track_id(dataset, record["id"])
+            self._track_id(dataset, snapshot.get("max_id"))
+
+        log_path = self._log_path(dataset)
+        size = 0
+        if os.path.exists(log_path):
+            with open(log_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    size += len(line.encode("utf-8"))
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # 最后一行可能因异常退出而不完整，忽略即可
+                        self.logger.warning(f"{dataset}日志存在损坏行，已跳过")
+                        continue
+                    self._apply(dataset, state, entry)
+        self.log_sizes[dataset] = size
+        return state
+
+    def _apply(self, dataset: str, state: Dict, entry: Dict):
+        op = entry.get("op")
+        if op == "put":
+            state[entry["record"]["id"]] = entry["record"]
+            self._track_id(dataset, entry["record"]["id"])
+        elif op == "del":
+            state.pop(entry["id"], None)
+            self._track_id(dataset, entry["id"])
+        elif op == "clear":
+            state.clear()
+
+    def _track_id(self, dataset: str, key: Any):
+        if isinstance(key, int) and key > self.max_ids.get(dataset, 0):
+            self.max_ids[dataset] = key
+
+    def is_empty(self, dataset: str) -> bool:
+        return not (os.path.exists(self._snapshot_path(dataset))
+                    or os.path.exists(self._log_path(dataset)))
+
+    def drop(self, dataset: str):
+        """删除数据集的快照和日志（关闭日志模式、数据已写回数据库后调用）"""
+        with self.lock:
+            for path in (self._snapshot_path(dataset), self._log_path(dataset)):
+                if os.path.exists(path):
+                    os.remove(path)
+            self.states.pop(dataset, None)
+            self.log_sizes.pop(dataset, None)
+            self.max_ids.pop(dataset, None)
+
+    # --------------------- 追加写入 ---------------------
+    def _append(self, dataset: str, entries: List[Dict]):
+        lines = "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in entries)
+        with open(self._log_path(dataset), "a", encoding="utf-8") as f:
+            f.write(lines)
+        self.log_sizes[dataset] = self.log_sizes.get(dataset, 0) + len(lines.encode("utf-8"))
+        if self.log_sizes[dataset] > self.compact_threshold:
+            self.compact(dataset)
+
+    def _prepare(self, dataset: str, record: Dict) -> Dict:
+        record = dict(record)
+        if TABLES[dataset]["auto_id"] and record.get("id") is None:
+            record["id"] = self.max_ids.get(dataset, 0) + 1
+        self._track_id(dataset, record["id"])
+        return record
+
+    # --------------------- 与SQLiteStore一致的接口 ---------------------
+    def load_all(self, dataset: str) -> List[Dict]:
+        order = TABLES[dataset]["order"]
+        with self.lock:
+            records = [dict(r) for r in self._state(dataset).values()]
+        return sorted(records, key=lambda r: sort_key(r.get(order)))
+
+    def load_index(self, dataset: str) -> List[Dict]:
+        columns = index_columns(dataset)
+        return [{c: r.get(c) for c in columns} for r in self.load_all(dataset)]
+
+    def load_one(self, dataset: str, key: Any):
+        with self.lock:
+            record = self._state(dataset).get(key)
+        return dict(record) if record else None
+
+    def upsert(self, dataset: str, record: Dict) -> Any:
+        with self.lock:
+            state = self._state(dataset)
+            record = self._prepare(dataset, record)
+            if state.get(record["id"]) != record:  # 内容未变化的记录不追加日志
+                state[record["id"]] = record
+                self._append(dataset, [{"op": "put", "record": record}])
+            return record["id"]
+
+    def upsert_many(self, dataset: str, records: List[Dict]):
+        with self.lock:
+            state = self._state(dataset)
+            entries = []
+            for original in records:
+                record = self._prepare(dataset, original)
+                original["id"] = record["id"]
+                if state.get(record["id"]) == record:
+                    continue
+                state[record["id"]] = record
+                entries.append({"op": "put", "record": record})
+            if entries:
+                self._append(dataset, entries)
+
+    def delete(self, dataset: str, key: Any):
+        with self.lock:
+            state = self._state(dataset)
+            if key in state:
+                del state[key]
+                self._append(dataset, [{"op": "del", "id": key}])
+
+    def replace_all(self, dataset: str, records: List[Dict]):
+        with self.lock:
+            self._state(dataset).clear()
+            self._append(dataset, [{"op": "clear"}])
+            self.upsert_many(dataset, records)
+
+    # --------------------- 日志合并 ---------------------
+    def compact(self, dataset: str):
+        """把日志合并进新快照，然后清空日志"""
+        with self.lock:
+            state = self._state(dataset)
+            snapshot_path = self._snapshot_path(dataset)
+            temp_path = f"{snapshot_path}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(self.serializer.dumps({"records": list(state.values()),
+                                               "max_id": self.max_ids.get(dataset, 0)}))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, snapshot_path)
+            # 快照落盘后再截断日志，中途崩溃最多重放一遍已合并的记录
+            open(self._log_path(dataset), "w").close()
+            self.log_sizes[dataset] = 0
+            self.logger.info(f"{dataset}日志已合并为快照（{len(state)}条记录）")
@@ -0,0 +1,188 @@
+# markdown_render.py
+import re
+import html
+import hashlib
+import threading
+from typing import List, Optional
+
+import markdown
+
+from modules.cache import LRUCache, DiskCache
+
+RENDER_VERSION = "4"  # 渲染规则变化时修改，使旧缓存失效
+FORMULA_VERSION = "1"  # MathJax版本或输出配置变化时修改，使公式SVG缓存失效
+MARKDOWN_EXTENSIONS = ['extra', 'codehilite']
+RENDER_CACHE_DIR = "render_cache"
+RENDER_MEMORY_BYTES = 8 * 1024 * 1024
+RENDER_DISK_BYTES = 50 * 1024 * 1024
+BLOCK_CACHE_BYTES = 8 * 1024 * 1024
+
+# 围栏代码和行内代码先替换为占位符，其中的$不当作公式，也不会与代码外的$配对
+CODE_RE = re.compile(
+    r"^ {0,3}(?P<fence>`{3,}|~{3,})[^\n]*\n.*?(?:^ {0,3}(?P=fence)[ \t]*$|\Z)"
+    r"|(?P<ticks>`+)(?!`)(?:(?!\n[ \t]*\n).)+?(?<!`)(?P=ticks)(?!`)",
+    re.DOTALL | re.MULTILINE)
+CODE_PLACEHOLDER = "\ue002{}\ue003"
+CODE_PLACEHOLDER_RE = re.compile("\ue002(\\d+)\ue003")
+# LaTeX公式：$$..$$、\[..\]、\(..\)、$..$；先取出公式再渲染Markdown，避免下划线、反斜杠被转义
+MATH_RE = re.compile(
+    r"\$\$.+?\$\$"
+    r"|\\\[.+?\\\]"
+    r"|\\\(.+?\\\)"
+    r"|(?<![\\$])\$(?!\s)[^$\n]+?(?<!\s)\$",
+    re.DOTALL)
+PLACEHOLDER = "\ue000{}\ue001"  # 私用区字符，不会被Markdown处理
+PLACEHOLDER_RE = re.compile("\ue000(\\d+)\ue001")
+
+# 分块规则
+FENCE_RE = re.compile(r"^ {0,3}(`{3,}|~{3,})")
+LIST_ITEM_RE = re.compile(r"^\s*([*+-]|\d+[.)])\s")
+QUOTE_RE = re.compile(r"^ {0,3}>")
+# 引用式链接、脚注、缩写依赖全文上下文；原始HTML块可以跨空行（其中的空行不分段），都不能分块渲染
+GLOBAL_SYNTAX_RE = re.compile(r"^ {0,3}\[[^\]]+\]:|^\*\[|^ {0,3}<[a-zA-Z/!]", re.MULTILINE)
+
+_local = threading.local()
+
+
+def _converter() -> markdown.Markdown:
+    # 创建Markdown实例（加载扩展）比转换一小段文本还慢，每个线程复用一个
+    md = getattr(_local, "markdown", None)
+    if md is None:
+        md = _local.markdown = markdown.Markdown(extensions=MARKDOWN_EXTENSIONS)
+    return md
+
+
+def formula_key(tex: str, display: bool) -> str:
+    return hashlib.sha256(f"{FORMULA_VERSION}\n{int(display)}\n{tex}".encode("utf-8")).hexdigest()
+
+
+def formula_span(formula: str) -> str:
+    """公式源码（含定界符）包在带缓存键的span中，键由TeX内容和是否为行间公式决定"""
+    display = formula.startswith(("$$", "\\["))
+    width = 1 if formula[0] == "$" and not formula.startswith("$$") else 2
+    key = formula_key(formula[width:-width].strip(), display)
+    return f'<span class="tex" data-key="{key}">{html.escape(formula)}</span>'
+
+
+def render_markdown(text: str) -> str:
+    """Markdown + LaTeX 渲染为HTML片段（公式原样保留在span.tex中，由MathJax排版）"""
+    codes, formulas = [], []
+
+    def stash_code(match):
+        codes.append(match.group())
+        return CODE_PLACEHOLDER.format(len(codes) - 1)
+
+    def restore_code(text):
+        return CODE_PLACEHOLDER_RE.sub(lambda m: codes[int(m.group(1))], text)
+
+    def stash(match):
+        formulas.append(restore_code(match.group()))
+        return PLACEHOLDER.format(len(formulas) - 1)
+
+    text = restore_code(MATH_RE.sub(stash, CODE_RE.sub(stash_code, text)))
+    md = _converter()
+    md.reset()
+    body = md.convert(text)
+    return PLACEHOLDER_RE.sub(lambda m: formula_span(formulas[int(m.group(1))]), body)
+
+
+def render_key(text: str) -> str:
+    return hashlib.sha256(f"{RENDER_VERSION}.{FORMULA_VERSION}\n{text}".encode("utf-8")).hexdigest()
+
+
+class RenderCache:
+    """按内容哈希缓存渲染结果：内存LRU在前，磁盘缓存在后"""
+
+    def __init__(self, disk_dir: Optional[str] = None,
+                 memory_bytes: int = RENDER_MEMORY_BYTES, disk_bytes: int = RENDER_DISK_BYTES):
+        self.memory = LRUCache(memory_bytes)
+        self.disk = DiskCache(disk_dir, disk_bytes) if disk_dir else None
+
+    def render(self, text: str) -> str:
+        key = render_key(text)
+        rendered = self.memory.get(key)
+        if rendered is not None:
+            return rendered
+        data = self.disk.get(key) if self.disk is not None else None
+        if data is not None:
+            rendered = data.decode("utf-8")
+        else:
+            rendered = render_markdown(text)
+            if self.disk is not None:
+                self.disk.put(key, rendered.encode("utf-8"))
+        self.memory.put(key, rendered)
+        return rendered
+
+
+def split_blocks(text: str) -> List[str]:
+    """按空行把源码切为顶层块；围栏代码、多行公式、缩进续行、同一列表或引用内的空行不切分"""
+    blocks, current = [], []
+    fence = None       # 当前围栏代码的开始标记
+    math_end = None    # 当前多行公式的结束标记
+    blank = False      # 上一行是否为空行
+    list_block = False  # 当前块是否以列表项开头
+    quote_chunk = False  # 上一个空行之后的内容是否以引用开头（空行隔开的引用会合并为一个blockquote）
+
+    def flush():
+        while current and not current[-1].strip():
+            current.pop()
+        if current:
+            blocks.append("\n".join(current))
+        current.clear()
+
+    for line in text.split("\n"):
+        stripped = line.strip()
+        if fence:
+            current.append(line)
+            if stripped.startswith(fence) and not stripped.strip(fence[0]):
+                fence = None
+            continue
+        if math_end:
+            current.append(line)
+            if math_end in stripped:
+                math_end = None
+            continue
+        if not stripped:
+            blank = bool(current)
+            if current:
+                current.append(line)
+            continue
+        is_item = bool(LIST_ITEM_RE.match(line))
+        is_quote = bool(QUOTE_RE.match(line))
+        if blank and line[0] not in " \t" and not (list_block and is_item) and not (quote_chunk and is_quote):
+            flush()
+        if not current:
+            list_block = is_item
+        if blank or not current:
+            quote_chunk = is_quote
+        blank = False
+        current.append(line)
+        match = FENCE_RE.match(line)
+        if match:
+            fence = match.group(1)
+        elif stripped.startswith("$$") and stripped.count("$$") == 1:
+            math_end = "$$"
+        elif stripped.startswith("\\[") and "\\]" not in stripped:
+            math_end = "\\]"
+    flush()
+    return blocks
+
+
+class BlockRenderer:
+    """按顶层块增量渲染：每块的HTML按内容哈希缓存，编辑时只重新渲染改动的块"""
+
+    def __init__(self, memory_bytes: int = BLOCK_CACHE_BYTES):
+        self.cache = LRUCache(memory_bytes)
+
+    def render(self, text: str) -> str:
+        if GLOBAL_SYNTAX_RE.search(text):
+            return render_markdown(text)
+        parts = []
+        for block in split_blocks(text):
+            key = render_key(block)
+            rendered = self.cache.get(key)
+            if rendered is None:
+                rendered = render_markdown(block)
+                self.cache.put(key, rendered)
+            parts.append(rendered)
+        return "\n".join(parts)
@@ -1,26 +1,116 @@
 # notes.py
 import json
 import os
+import html
+import hashlib
+import threading
 import datetime
 from datetime import datetime
-import markdown
 from PyQt5.QtWidgets import *
 from PyQt5.QtCore import *
 from PyQt5.QtGui import *
 from PyQt5.QtWebEngineWidgets import QWebEngineView
+from modules.data_manager import DataManager
+from modules.cache import LRUCache
+from modules.text_index import snippet
+from modules.tag_index import TagIndex, ALL_TAGS, NO_TAG, quote_tag
+from modules.markdown_render import BlockRenderer
+from modules.web_assets import BASE_URL, MATHJAX_CONFIG, MATHJAX_SCRIPT, HIGHLIGHT_TAGS
+from modules.formula_cache import FormulaCache, FORMULA_CACHE_DIR, attach_formula_cache, formula_scripts
 
-NOTES_FILE = "data/notes_data.json"
+NOTES_DATASET = "notes"
 NOTES_DIR = "data/notes"
+MANIFEST_FILE = "notes_manifest.json"  # 笔记内容哈希清单，与数据库同在data目录
+NOTES_CACHE_BYTES = 16 * 1024 * 1024  # 笔记内容缓存上限（字节）
+PREVIEW_DELAY_MS = 120  # 停止输入多久后刷新预览
+NOTES_INDEX = "notes_index"  # 笔记全文索引（标题、标签、内容）
+SEARCH_DELAY_MS = 150
+SEARCH_LIMIT = 50
+
+# 预览页面的JS接口：只替换与上次不同的顶层块，公式和代码高亮只处理新块
+PREVIEW_JS = """
+const preview = {
+    root: document.getElementById('content'),
+    patch(html) {
+        const template = document.createElement('template');
+        template.innerHTML = html;
+        const fresh = Array.from(template.content.childNodes);
+        const old = Array.from(this.root.childNodes);
+        // 跳过首尾相同的块，只替换中间变化的部分
+        let start = 0;
+        while (start < old.length && start < fresh.length && this.same(old[start], fresh[start])) start++;
+        let oldEnd = old.length, freshEnd = fresh.length;
+        while (oldEnd > start && freshEnd > start && this.same(old[oldEnd - 1], fresh[freshEnd - 1])) {
+            oldEnd--;
+            freshEnd--;
+        }
+        const anchor = oldEnd < old.length ? old[oldEnd] : null;
+        const removed = old.slice(start, oldEnd);
+        if (window.MathJax && MathJax.typesetClear) {
+            MathJax.typesetClear(removed.filter(node => node.nodeType === Node.ELEMENT_NODE));
+        }
+        removed.forEach(node => node.remove());
+        const added = [];
+        for (let i = start; i < freshEnd; i++) {
+            const node = fresh[i];
+            node.__source = this.source(node);
+            this.root.insertBefore(node, anchor);
+            if (node.nodeType === Node.ELEMENT_NODE) added.push(node);
+        }
+        this.decorate(added);
+    },
+    source(node) {
+        return node.nodeType === Node.ELEMENT_NODE ? node.outerHTML : node.textContent;
+    },
+    same(node, fresh) {
+        // 已排版的块与原始HTML不同，比较插入时记录的源码
+        return node.__source === this.source(fresh);
+    },
+    decorate(nodes) {
+        if (!nodes.length) return;
+        if (window.hljs) {
+            for (const node of nodes) {
+                node.querySelectorAll('pre code').forEach(el => hljs.highlightElement(el));
+            }
+        }
+        formulas.typeset(nodes);  // 已缓存的公式以SVG嵌入，只排版新公式
+    },
+    scrollTo(ratio) {
+        const el = document.documentElement;
+        window.scrollTo(0, ratio * (el.scrollHeight - el.clientHeight));
+    }
+};
+"""
+
+
+def content_hash(text):
+    """笔记内容的SHA-1哈希"""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
 
 class NotesModule(QWidget):
     content_updated = pyqtSignal(dict)
+    content_written = pyqtSignal(object, str)  # 笔记ID, 已写入txt的内容（从写入线程发出）
     
-    def __init__(self):
+    def __init__(self, data_manager=None, cache_bytes=NOTES_CACHE_BYTES, formula_cache=None):
         super().__init__()
+        self.data_manager = data_manager or DataManager()
         self.notes = []
-        self.tags = ["所有标签", "无标签"]
+        # 未编辑过的笔记内容按需从txt读取并放入LRU缓存；编辑过的内容保存在笔记字典的content字段中，写入txt后移回缓存
+        self.content_cache = LRUCache(cache_bytes)
+        self.content_written.connect(self.release_content)
+        self.tag_index = TagIndex()  # 标签 -> 笔记ID，保存和删除时增量维护
         self.current_note = None
         self.expanded_items = set()
+        self.dirty_ids = set()   # 内容有改动、待写入txt的笔记
+        self.manifest = {}       # 笔记ID -> {hash, size, mtime}
+        self.submitted = {}      # 笔记ID -> 最近一次提交写入的内容哈希（写入线程执行前清单尚未更新）
+        self.manifest_lock = threading.Lock()
+        self.preview_ready = False  # 预览页面只加载一次，之后通过JS接口增量更新
+        self.pending_preview = []
+        self.preview_html = None
+        self.preview_renderer = BlockRenderer()  # 按块缓存渲染结果，编辑时只重新渲染改动的块
+        self.formula_cache = formula_cache or FormulaCache(
+            os.path.join(self.data_manager.data_dir, FORMULA_CACHE_DIR))
         
         os.makedirs(NOTES_DIR, exist_ok=True)
         self.init_ui()
@@ -57,6 +147,17 @@ class NotesModule(QWidget):
         panel.setFixedWidth(300)
         layout = QVBoxLayout(panel)
         
+        # 全文搜索：有输入时用结果列表代替文件夹/标签视图
+        self.search_bar = QLineEdit()
+        self.search_bar.setPlaceholderText("搜索笔记...")
+        self.search_bar.textChanged.connect(self.filter_notes)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.timeout.connect(self.run_search)
+        self.search_results = QListWidget()
+        self.search_results.itemClicked.connect(self.open_search_result)
+        self.search_results.hide()
+        
         self.mode_tabs = QTabWidget()
         self.folder_tree = QTreeWidget()
         self.folder_tree.setHeaderHidden(True)
@@ -64,14 +165,23 @@ class NotesModule(QWidget):
         self.folder_tree.setContextMenuPolicy(Qt.CustomContextMenu)
         self.folder_tree.customContextMenuRequested.connect(self.show_tree_context_menu)
         
+        # 标签筛选：点击标签筛选该标签，按住Ctrl点击追加为AND条件，也可直接编辑表达式
+        tag_panel = QWidget()
+        tag_layout = QVBoxLayout(tag_panel)
+        tag_layout.setContentsMargins(0, 0, 0, 0)
+        self.tag_filter = QLineEdit()
+        self.tag_filter.setPlaceholderText("如：数学 物理 | 编程 -草稿")
+        self.tag_filter.setToolTip("空格分隔表示同时包含（AND），| 表示或（OR），- 前缀表示排除（NOT）；含空格的标签用引号括起")
+        self.tag_filter.textChanged.connect(self.apply_tag_filter)
         self.tag_list = QListWidget()
-        self.tag_list.addItem("无标签")
         self.tag_list.itemClicked.connect(self.filter_by_tag)
         self.tag_list.setContextMenuPolicy(Qt.CustomContextMenu)
         self.tag_list.customContextMenuRequested.connect(self.show_tag_context_menu)
+        tag_layout.addWidget(self.tag_filter)
+        tag_layout.addWidget(self.tag_list)
         
         self.mode_tabs.addTab(self.folder_tree, "文件夹")
-        self.mode_tabs.addTab(self.tag_list, "标签筛选")
+        self.mode_tabs.addTab(tag_panel, "标签筛选")
         
         self.new_btn = QPushButton("新建笔记")
         self.new_btn.clicked.connect(self.create_note)
@@ -86,7 +196,9 @@ class NotesModule(QWidget):
             QPushButton:hover { background: #1976D2; }
         """)
         
+        layout.addWidget(self.search_bar)
         layout.addWidget(self.mode_tabs)
+        layout.addWidget(self.search_results)
         layout.addWidget(self.new_btn)
         return panel
 
@@ -127,6 +239,10 @@ class NotesModule(QWidget):
         editor_layout.setContentsMargins(0, 0, 0, 0)
         self.editor = QTextEdit()
         self.editor.textChanged.connect(self.update_preview)
+        self.editor.verticalScrollBar().valueChanged.connect(self.sync_preview_scroll)
+        self.preview_timer = QTimer(self)
+        self.preview_timer.setSingleShot(True)
+        self.preview_timer.timeout.connect(self.render_preview)
         editor_layout.addWidget(self.editor)
         
         # 右侧预览区
@@ -134,6 +250,9 @@ class NotesModule(QWidget):
         preview_layout = QVBoxLayout(preview_box)
         preview_layout.setContentsMargins(0, 0, 0, 0)
         self.preview = QWebEngineView()
+        self.preview.loadFinished.connect(self.on_preview_loaded)
+        attach_formula_cache(self.preview, self.formula_cache)
+        self.preview.setHtml(self.get_preview_html(), BASE_URL)
         preview_layout.addWidget(self.preview)
         
         splitter.addWidget(editor_box)
@@ -159,45 +278,16 @@ class NotesModule(QWidget):
         layout.addWidget(self.save_btn)
         return panel
 
-    def update_preview(self):
-        content = self.editor.toPlainText()
-        html = markdown.markdown(content, extensions=['extra', 'codehilite'])
+    def get_preview_html(self):
+        """预览页面只加载一次，之后通过preview.patch增量更新"""
+        mathjax_config = MATHJAX_CONFIG + MATHJAX_SCRIPT
         
-        # 增强的LaTeX支持
-        mathjax_config = """
-        <script>
-        MathJax = {
-          tex: {
-            inlineMath: [['$', '$'], ['\\(', '\\)']],
-            displayMath: [['$$', '$$'], ['\\[', '\\]']],
-            processEscapes: true,
-            packages: {'[+]': ['amsmath']}
-          },
-          options: {
-            ignoreHtmlClass: 'tex2jax_ignore',
-            processHtmlClass: 'tex2jax_process'
-          },
-          loader: {load: ['[tex]/amsmath']},
-          startup: {
-            ready: () => {
-              MathJax.startup.defaultReady();
-              MathJax.startup.promise.then(() => {
-                console.log('MathJax initial typesetting complete');
-              });
-            }
-          }
-        };
-        </script>
-        <script src="https://cdn.jsdelivr.net/npm/mathjax@3/es5/tex-mml-chtml.js" async></script>
-        """
-        
-        self.preview.setHtml(f"""
+        return f"""
             <!DOCTYPE html>
             <html>
             <head>
                 <meta charset="utf-8">
-                <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/highlight.js/11.5.0/styles/default.min.css">
-                <script src="https://cdnjs.cloudflare.com/ajax/libs/highlight.js/11.5.0/highlight.min.js"></script>
+                {HIGHLIGHT_TAGS}
                 <style>
                     body {{ 
                         padding: 20px; 
@@ -223,19 +313,14 @@ class NotesModule(QWidget):
                 {mathjax_config}
             </head>
             <body>
-                {html}
+                <div id="content"></div>
+                {formula_scripts()}
                 <script>
-                    document.addEventListener('DOMContentLoaded', (event) => {{
-                        hljs.highlightAll();
-                        // 自动重新渲染数学公式
-                        if(typeof MathJax !== 'undefined') {{
-                            MathJax.typesetPromise();
-                        }}
-                    }});
+                {PREVIEW_JS}
                 </script>
             </body>
             </html>
-        """)
+        """
 
     # 其余方法保持与之前相同（show_tree_context_menu、save_data、load_data等）
     # ...
@@ -264,7 +349,7 @@ class NotesModule(QWidget):
     def show_tag_context_menu(self, pos):
         item = self.tag_list.itemAt(pos)
         menu = QMenu()
-        if item and item.text() != "无标签":
+        if item and item.data(Qt.UserRole) not in (ALL_TAGS, NO_TAG):
             delete_action = QAction("删除标签", self)
             delete_action.triggered.connect(lambda: self.delete_tag(item))
             menu.addAction(delete_action)
@@ -295,15 +380,10 @@ class NotesModule(QWidget):
             note_id = item.data(0, Qt.UserRole)
             note = next((n for n in self.notes if n["id"] == note_id), None)
             if note:
-                # 重命名对应的txt文件
-                old_file = os.path.join(NOTES_DIR, f"{note['id']}.txt")
-                new_file = os.path.join(NOTES_DIR, f"{note['id']}_{new_title}.txt")
-                if os.path.exists(old_file):
-                    os.rename(old_file, new_file)
-                
+                # 标题只存在元数据中，内容文件始终按ID命名
                 note["title"] = new_title
                 item.setText(0, new_title)
-                self.save_data()
+                self.save_note(note)
 
     def delete_note(self, item):
         note_id = item.data(0, Qt.UserRole)
@@ -313,70 +393,239 @@ class NotesModule(QWidget):
             QMessageBox.Yes | QMessageBox.No
         )
         if confirm == QMessageBox.Yes:
-            # 删除笔记文件
-            note_file = os.path.join(NOTES_DIR, f"{note_id}.txt")
-            if os.path.exists(note_file):
-                os.remove(note_file)
+            # 删除笔记文件：与内容写入使用同一个键，替换尚未执行的写入，避免文件被重新创建
+            key = str(note_id)
+            note_file = os.path.join(NOTES_DIR, f"{key}.txt")
+
+            def forget():
+                with self.manifest_lock:
+                    self.manifest.pop(key, None)
+                self.save_manifest()
+
+            self.data_manager.delete_file(note_file, on_deleted=forget)
+            self.dirty_ids.discard(note_id)
+            self.submitted.pop(key, None)
+            self.content_cache.pop(note_id)
                 
             self.notes = [n for n in self.notes if n["id"] != note_id]
+            self.data_manager.delete_record(NOTES_DATASET, note_id)
+            self.data_manager.unindex_document(NOTES_INDEX, note_id)
+            self.tag_index.remove(note_id)
             self.update_views()
-            self.save_data()
+            if self.search_bar.text().strip():
+                self.run_search()
 
     def delete_tag(self, item):
-        tag = item.text()
-        if tag == "无标签":
+        tag = item.data(Qt.UserRole)
+        if tag in (ALL_TAGS, NO_TAG):
             return
             
-        # 从所有笔记中移除该标签
+        # 只处理并保存索引中带该标签的笔记
+        affected = self.tag_index.remove_tag(tag)
         for note in self.notes:
-            if tag in note.get("tags", []):
+            if note["id"] in affected:
                 note["tags"].remove(tag)
-        # 从标签列表移除
-        self.tags.remove(tag)
+                self.data_manager.save_record(NOTES_DATASET, self.note_meta(note))
+                self.index_note(note)
         self.update_views()
-        self.save_data()
 
     def load_data(self):
-        try:
-            with open(NOTES_FILE, "r") as f:
-                data = json.load(f)
-                self.notes = data.get("notes", [])
-                # 合并标签并去重
-                all_tags = {tag for note in self.notes for tag in note.get("tags", [])}
-                self.tags = ["无标签"] + list(all_tags)
-                
-                # 加载时保留展开状态
-                self.update_views(keep_expanded=True)
-                
-                # 加载txt文件内容
-                for note in self.notes:
-                    file_path = os.path.join(NOTES_DIR, f"{note['id']}.txt")
-                    if os.path.exists(file_path):
-                        with open(file_path, "r", encoding="utf-8") as f:
-                            note["content"] = f.read()
-        except FileNotFoundError:
-            pass
+        self.notes = self.data_manager.load_records(NOTES_DATASET)
+        self.tag_index.rebuild(self.notes)
+        
+        # 加载时保留展开状态
+        self.update_views(keep_expanded=True)
+        
+        # 启动时只加载元数据，内容在打开笔记时再读取；在程序外被修改的笔记重新索引
+        for note in self.check_consistency():
+            self.index_note(note)
+        # 全文索引随保存增量更新，只在首次使用或分词规则变化时在后台整体重建
+        # 重建在索引线程中进行：元数据先复制一份，内容直接读txt，不经过内容缓存也不改动笔记字典
+        metas = [self.note_meta(n) for n in self.notes]
+        self.data_manager.ensure_index(NOTES_INDEX, lambda: (
+            (meta["id"], self.note_text(meta, self.read_content(meta["id"]))) for meta in metas))
 
-    def save_data(self):
-        # 保存到JSON
-        data = {
-            "notes": [{
-                "id": n["id"],
-                "title": n["title"],
-                "tags": n.get("tags", []),
-                "path": n.get("path", ""),
-                "created": n.get("created", ""),
-                "modified": datetime.now().isoformat()
-            } for n in self.notes]
+    def check_consistency(self):
+        """启动一致性检查：大小和修改时间与清单一致的文件直接信任，其余重新计算哈希
+
+        返回内容与清单记录不同（文件在程序外被修改或删除）的笔记。
+        """
+        manifest = self.data_manager.safe_load(MANIFEST_FILE, {})
+        changed = []
+        modified = []
+        for note in self.notes:
+            key = str(note["id"])
+            file_path = os.path.join(NOTES_DIR, f"{key}.txt")
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                if manifest.pop(key, None) is not None:
+                    modified.append(note)
+                continue
+            entry = manifest.get(key)
+            if entry and entry.get("size") == stat.st_size and entry.get("mtime") == stat.st_mtime_ns:
+                continue
+            digest = content_hash(self.get_content(note))
+            if entry and entry.get("hash") != digest:
+                modified.append(note)
+            manifest[key] = {"hash": digest, "size": stat.st_size, "mtime": stat.st_mtime_ns}
+            changed.append(key)
+        # 清单中已不存在的笔记
+        existing = {str(n["id"]) for n in self.notes}
+        stale = [key for key in manifest if key not in existing]
+        for key in stale:
+            del manifest[key]
+        with self.manifest_lock:
+            self.manifest = manifest
+        if changed or stale:
+            self.save_manifest()
+        return modified
+
+    def save_manifest(self):
+        with self.manifest_lock:
+            self.data_manager.schedule_save(MANIFEST_FILE, self.manifest, backup=False)
+
+    def read_content(self, note_id):
+        """从txt读取笔记内容，文件不存在时返回空字符串"""
+        file_path = os.path.join(NOTES_DIR, f"{note_id}.txt")
+        if not os.path.exists(file_path):
+            return ""
+        with open(file_path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    def get_content(self, note):
+        """按需获取笔记内容：优先使用内存中的编辑内容，其次LRU缓存，最后读取txt"""
+        if "content" in note:
+            return note["content"]
+        content = self.content_cache.get(note["id"])
+        if content is None:
+            content = self.read_content(note["id"])
+            self.content_cache.put(note["id"], content)
+        return content
+
+    def mark_dirty(self, note):
+        """标记笔记内容需要写入"""
+        self.dirty_ids.add(note["id"])
+
+    def note_meta(self, note):
+        """笔记元数据（内容单独存放在txt中）"""
+        return {
+            "id": note["id"],
+            "title": note["title"],
+            "tags": note.get("tags", []),
+            "path": note.get("path", ""),
+            "created": note.get("created", ""),
+            "modified": note.get("modified", datetime.now().isoformat())
         }
-        with open(NOTES_FILE, "w") as f:
-            json.dump(data, f, indent=2)
+
+    def write_content(self, note):
+        """写入笔记内容；与最近一次提交（没有时为清单）的哈希一致时跳过"""
+        self.dirty_ids.discard(note["id"])
+        key = str(note["id"])
+        text = self.get_content(note)
+        digest = content_hash(text)
+        last = self.submitted.get(key)
+        if last is None:
+            with self.manifest_lock:
+                last = self.manifest.get(key, {}).get("hash")
+        if last == digest:
+            with self.manifest_lock:
+                on_disk = self.manifest.get(key, {}).get("hash") == digest
+            if on_disk:
+                self.release_content(note["id"], text)
+            return
+        self.submitted[key] = digest
+        file_path = os.path.join(NOTES_DIR, f"{key}.txt")
+
+        def record_stat():
+            # 在写入线程中执行：记录新文件的大小和修改时间
+            stat = os.stat(file_path)
+            with self.manifest_lock:
+                self.manifest[key] = {"hash": digest, "size": stat.st_size, "mtime": stat.st_mtime_ns}
+            self.save_manifest()
+            self.content_written.emit(note["id"], text)
+
+        self.data_manager.write_text(file_path, text, on_written=record_stat)
+
+    def release_content(self, note_id, text):
+        """内容已写入txt且之后未再修改时，从笔记字典移回LRU缓存，使内存占用受缓存上限约束"""
+        note = next((n for n in self.notes if n["id"] == note_id), None)
+        if note is None or note_id in self.dirty_ids or note.get("content") != text:
+            return
+        del note["content"]
+        self.content_cache.put(note_id, text)
+
+    def save_note(self, note):
+        """只保存单篇笔记的元数据和内容"""
+        meta = self.note_meta(note)
+        self.data_manager.save_record(NOTES_DATASET, meta)
+        if note["id"] in self.dirty_ids:
+            self.write_content(note)
+        self.tag_index.update(note["id"], note.get("tags", []))
+        self.index_note(note)
+        self.content_updated.emit({"type": "note", "data": meta})
+
+    # --------------------- 全文搜索 ---------------------
+    def note_text(self, note, content=None):
+        """参与索引的文本：标题、标签和内容（未给出content时按需获取）"""
+        if content is None:
+            content = self.get_content(note)
+        return "\n".join([note.get("title", ""), " ".join(note.get("tags", [])), content])
+
+    def cached_content(self, note):
+        """内存中已有的笔记内容，不读取txt；不在内存中时返回None"""
+        if "content" in note:
+            return note["content"]
+        return self.content_cache.get(note["id"])
+
+    def index_note(self, note):
+        self.data_manager.index_document(NOTES_INDEX, note["id"], self.note_text(note))
+
+    def filter_notes(self):
+        # 输入停顿后再检索，避免每个按键都查询
+        self.search_timer.start(SEARCH_DELAY_MS)
+
+    def run_search(self):
+        """按相关度列出匹配的笔记并显示命中片段"""
+        query = self.search_bar.text().strip()
+        searching = bool(query)
+        self.mode_tabs.setVisible(not searching)
+        self.search_results.setVisible(searching)
+        self.search_results.clear()
+        if not searching:
+            return
+        notes = {n["id"]: n for n in self.notes}
+        for note_id, _ in self.data_manager.search_text(NOTES_INDEX, query, SEARCH_LIMIT):
+            note = notes.get(note_id)
+            if note is None:
+                continue
+            item = QListWidgetItem()
+            item.setData(Qt.UserRole, note_id)
+            # 片段只取内存中已有的内容，输入时不在GUI线程读文件；未缓存的笔记显示标签
+            content = self.cached_content(note)
+            text = content if content is not None else " ".join(note.get("tags", []))
+            label = QLabel(f"<b>{html.escape(note['title'])}</b><br>"
+                           f"<span style='color:#666'>{snippet(text, query)}</span>")
+            label.setWordWrap(True)
+            label.setContentsMargins(6, 4, 6, 4)
+            item.setSizeHint(label.sizeHint())
+            self.search_results.addItem(item)
+            self.search_results.setItemWidget(item, label)
+
+    def open_search_result(self, item):
+        note_id = item.data(Qt.UserRole)
+        self.current_note = next((n for n in self.notes if n["id"] == note_id), None)
+        self.load_note_data()
+
+    def save_data(self):
+        # 批量保存元数据
+        data = {"notes": [self.note_meta(n) for n in self.notes]}
+        self.data_manager.save_records(NOTES_DATASET, data["notes"])
             
-        # 单独保存内容到txt
+        # 只把有改动的笔记内容写入txt
         for note in self.notes:
-            file_path = os.path.join(NOTES_DIR, f"{note['id']}.txt")
-            with open(file_path, "w", encoding="utf-8") as f:
-                f.write(note.get("content", ""))
+            if note["id"] in self.dirty_ids:
+                self.write_content(note)
 
         self.content_updated.emit({"type": "notes", "data": data})
 
@@ -419,15 +668,15 @@ class NotesModule(QWidget):
         if keep_expanded:
             self.restore_expanded_state()
         
-        # 更新标签列表（新增"所有标签"处理）
+        self.refresh_tag_list()
+
+    def refresh_tag_list(self):
+        """按标签索引显示标签及笔记数（所有标签、无标签在前）"""
         self.tag_list.clear()
-        all_tags = set()
-        for note in self.notes:
-            all_tags.update(note.get("tags", []))
-        
-        # 保持固定顺序：所有标签、无标签 + 其他标签
-        self.tags = ["所有标签", "无标签"] + sorted(all_tags - {"所有标签", "无标签"})
-        self.tag_list.addItems(self.tags)
+        for tag, count in self.tag_index.tag_counts():
+            item = QListWidgetItem(f"{tag} ({count})")
+            item.setData(Qt.UserRole, tag)
+            self.tag_list.addItem(item)
         self.tag_list.item(0).setSelected(True)
 
     def get_all_items(self, tree):
@@ -455,9 +704,10 @@ class NotesModule(QWidget):
             "modified": datetime.now().isoformat()
         }
         self.notes.append(self.current_note)
+        self.mark_dirty(self.current_note)
         self.update_views()
         self.load_note_data()
-        self.save_data()
+        self.save_note(self.current_note)
 
     def load_note(self, item):
         note_id = item.data(0, Qt.UserRole)
@@ -469,30 +719,43 @@ class NotesModule(QWidget):
         if self.current_note:
             self.title_input.setText(self.current_note.get("title", ""))
             self.tag_input.setText(", ".join(self.current_note.get("tags", [])))
-            self.editor.setPlainText(self.current_note.get("content", ""))
-            self.update_preview()
+            self.editor.setPlainText(self.get_content(self.current_note))
+            self.render_preview(scroll_top=True)  # 切换笔记时立即刷新，不等待防抖
 
     def update_preview(self):
-        content = self.editor.toPlainText()
-        html = markdown.markdown(content, extensions=['extra', 'codehilite'])
-        self.preview.setHtml(f"""
-            <html>
-            <head>
-                <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/highlight.js/11.5.0/styles/default.min.css">
-                <script src="https://cdnjs.cloudflare.com/ajax/libs/highlight.js/11.5.0/highlight.min.js"></script>
-                <style>
-                    body {{ padding: 20px; font-family: Segoe UI; }}
-                    pre {{ background: #f5f5f5; padding: 15px; border-radius: 8px; }}
-                </style>
-                <script src="https://polyfill.io/v3/polyfill.min.js?features=es6"></script>
-                <script id="MathJax-script" async src="https://cdn.jsdelivr.net/npm/mathjax@3/es5/tex-mml-chtml.js"></script>
-            </head>
-            <body>
-                {html}
-                <script>hljs.highlightAll();</script>
-            </body>
-            </html>
-        """)
+        # 输入停顿后再渲染，连续输入只渲染最后一次
+        self.preview_timer.start(PREVIEW_DELAY_MS)
+
+    def render_preview(self, scroll_top=False):
+        self.preview_timer.stop()
+        html = self.formula_cache.inject(self.preview_renderer.render(self.editor.toPlainText()))
+        if html == self.preview_html and not scroll_top:
+            return  # 渲染结果未变（如只改了空白）
+        self.preview_html = html
+        self.call_preview("patch", html)
+        if scroll_top:
+            self.call_preview("scrollTo", 0)
+
+    def sync_preview_scroll(self):
+        """预览按编辑器的滚动比例跟随"""
+        bar = self.editor.verticalScrollBar()
+        if bar.maximum() > 0:
+            self.call_preview("scrollTo", bar.value() / bar.maximum())
+
+    def on_preview_loaded(self, ok):
+        self.preview_ready = ok
+        if ok and self.pending_preview:
+            for script in self.pending_preview:
+                self.preview.page().runJavaScript(script)
+            self.pending_preview = []
+
+    def call_preview(self, method, *args):
+        """调用预览页面的preview接口；页面未就绪时先排队"""
+        script = f"preview.{method}({', '.join(json.dumps(a, ensure_ascii=False) for a in args)});"
+        if self.preview_ready:
+            self.preview.page().runJavaScript(script)
+        else:
+            self.pending_preview.append(script)
 
     def add_note(self, note_data):
         if not isinstance(note_data, dict):
@@ -511,7 +774,8 @@ class NotesModule(QWidget):
                 "modified": datetime.now().isoformat()
             }
             self.notes.append(new_note)
-            self.save_data()
+            self.mark_dirty(new_note)
+            self.save_note(new_note)
             self.update_views()
 
             # 自动选中新建的笔记（修复部分）
@@ -528,20 +792,26 @@ class NotesModule(QWidget):
             QMessageBox.critical(self, "错误", f"缺少必要字段: {str(e)}")
 
     def filter_by_tag(self, item):
-        selected_tag = item.text()
-        self.folder_tree.clear()
-        root = QTreeWidgetItem(self.folder_tree, [f"标签: {selected_tag}"])
-        
-        if selected_tag == "所有标签":
-            filtered = [n for n in self.notes if n.get("tags")]
-        elif selected_tag == "无标签":
-            filtered = [n for n in self.notes if not n.get("tags")]
+        tag = quote_tag(item.data(Qt.UserRole))  # 含空格或运算符的标签加引号
+        current = self.tag_filter.text().strip()
+        if QApplication.keyboardModifiers() & Qt.ControlModifier and current:
+            self.tag_filter.setText(f"{current} {tag}")  # 追加为AND条件
         else:
-            filtered = [n for n in self.notes if selected_tag in n.get("tags", [])]
-            
-        for note in filtered:
-            QTreeWidgetItem(root, [note["title"]])
-            
+            self.tag_filter.setText(tag)
+
+    def apply_tag_filter(self):
+        """按标签表达式筛选，结果由标签索引的集合运算得到"""
+        expression = self.tag_filter.text().strip()
+        if not expression:
+            self.update_views(keep_expanded=True)
+            return
+        matched = self.tag_index.query(expression)
+        self.folder_tree.clear()
+        root = QTreeWidgetItem(self.folder_tree, [f"标签: {expression} ({len(matched)})"])
+        for note in self.notes:
+            if note["id"] in matched:
+                item = QTreeWidgetItem(root, [note["title"]])
+                item.setData(0, Qt.UserRole, note["id"])
         root.setExpanded(True)
 
     def save_current(self):
@@ -549,20 +819,19 @@ class NotesModule(QWidget):
             # 处理LaTeX特殊字符转义
             content = self.editor.toPlainText()
             content = content.replace('\\', '\\\\')  # 转义反斜杠
+            if content != self.get_content(self.current_note):
+                # 改动过的内容留在内存中，直到写入txt前都不会被缓存淘汰
+                self.current_note["content"] = content
+                self.content_cache.pop(self.current_note["id"])
+                self.mark_dirty(self.current_note)
             
             self.current_note.update({
                 "title": self.title_input.text(),
                 "tags": [t.strip() for t in self.tag_input.text().split(",") if t.strip()],
-                "content": content,
                 "modified": datetime.now().isoformat()
             })
             
-            # 更新标签列表
-            for tag in self.current_note["tags"]:
-                if tag not in self.tags and tag != "无标签":
-                    self.tags.append(tag)
-            
-            self.save_data()
+            self.save_note(self.current_note)
             self.update_views(keep_expanded=True)
             
             # 定位当前笔记
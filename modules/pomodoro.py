@@ -3,7 +3,10 @@ from PyQt5.QtWidgets import *
 from PyQt5.QtCore import *
 from PyQt5.QtGui import *
 from datetime import datetime
-import math,os,json
+import math
+from modules.data_manager import DataManager
+
+POMO_DATASET = "pomo_records"
 
 class PomoModule(QWidget):
     timer_updated = pyqtSignal(int, str)  # 剩余时间(秒), 当前任务
@@ -11,9 +14,10 @@ class PomoModule(QWidget):
     task_started = pyqtSignal(str)        # 任务开始信号（带任务名称）
     task_stopped = pyqtSignal()           # 任务停止信号
     
-    def __init__(self, todo_module):
+    def __init__(self, todo_module, data_manager=None):
         super().__init__()
         self.todo_module = todo_module
+        self.data_manager = data_manager or DataManager()
         self.records = []  # 存储所有完成的番茄钟记录
         self.is_working = True
         self.is_running = False
@@ -197,7 +201,7 @@ class PomoModule(QWidget):
             }
             self.records.append(record)
             self.pomo_completed.emit(record)
-            self.save_data()  # 每次完成时保存数据
+            self.data_manager.save_record(POMO_DATASET, record)  # 每次完成时只追加一条记录
         
         # 提示信息
         msg = QMessageBox()
@@ -213,22 +217,13 @@ class PomoModule(QWidget):
         self.update_display()
 
     def save_data(self):
-        """保存番茄钟数据到文件"""
-        try:
-            os.makedirs("data", exist_ok=True)
-            with open("data/pomo_data.json", "w") as f:
-                json.dump(self.records, f, indent=2)
-        except Exception as e:
-            print("保存番茄钟数据失败:", e)
+        """保存番茄钟数据"""
+        if not self.data_manager.save_records(POMO_DATASET, self.records):
+            print("保存番茄钟数据失败，详见日志")
 
     def load_data(self):
         """加载番茄钟数据"""
-        try:
-            if os.path.exists("data/pomo_data.json"):
-                with open("data/pomo_data.json", "r") as f:
-                    self.records = json.load(f)
-        except Exception as e:
-            print("加载番茄钟数据失败:", e)
+        self.records = self.data_manager.load_records(POMO_DATASET)
 
     def update_display(self):
         mins, secs = divmod(self.remaining, 60)
@@ -0,0 +1,135 @@
+# schema.py
+import json
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+def _now():
+    return datetime.now().isoformat()
+
+
+def session_stats(session: Dict) -> Dict:
+    """根据会话历史更新会话索引中的消息数和字节数"""
+    history = session.get("history") or []
+    session["message_count"] = len(history)
+    session["byte_size"] = len(json.dumps(history, ensure_ascii=False).encode("utf-8"))
+    return session
+
+
+class Field:
+    """字段定义：类型、是否必填、缺省值、是否为ISO时间字符串"""
+
+    def __init__(self, name: str, types: Tuple = (), required: bool = False,
+                 default: Callable[[], Any] = lambda: None, iso: bool = False):
+        self.name = name
+        self.types = types
+        self.required = required
+        self.default = default
+        self.iso = iso
+
+
+class Schema:
+    """带版本号的记录结构；validate 在首次使用时编译为专用函数"""
+
+    def __init__(self, name: str, version: int, fields: List[Field],
+                 migrations: Optional[Dict[int, Callable[[Dict], Dict]]] = None):
+        self.name = name
+        self.version = version
+        self.fields = fields
+        self.migrations = migrations or {}  # 起始版本 -> 升级到下一版本的函数
+        self._validator = None
+
+    def compile(self) -> Callable[[Dict], Dict]:
+        """生成逐字段校验的Python函数，避免运行时遍历字段定义"""
+        src = ["def validate(record):"]
+        for i, field in enumerate(self.fields):
+            key = repr(field.name)
+            src.append(f"    value = record.get({key})")
+            src.append("    if value is None:")
+            if field.required:
+                src.append(f"        raise ValueError('缺少字段: ' + {key})")
+            else:
+                src.append(f"        record[{key}] = defaults[{i}]()")
+            if field.types:
+                src.append(f"    elif not isinstance(value, types[{i}]):")
+                src.append(f"        raise ValueError('字段类型错误: ' + {key})")
+            if field.iso:
+                src.append("    else:")
+                src.append("        fromisoformat(value)")
+        src.append("    return record")
+        namespace = {
+            "defaults": [f.default for f in self.fields],
+            "types": [f.types for f in self.fields],
+            "fromisoformat": datetime.fromisoformat,
+        }
+        exec(compile("\n".join(src), f"<schema {self.name} v{self.version}>", "exec"), namespace)
+        return namespace["validate"]
+
+    def validate(self, record: Dict) -> Dict:
+        """校验并补全单条记录，不合法时抛出ValueError"""
+        if self._validator is None:
+            self._validator = self.compile()
+        return self._validator(record)
+
+    def migrate(self, record: Dict, from_version: int) -> Dict:
+        """把记录从旧版本逐级升级到当前版本"""
+        for version in range(from_version, self.version):
+            step = self.migrations.get(version)
+            if step:
+                record = step(record)
+        return record
+
+    def upgrade(self, records: List[Dict], from_version: int) -> Tuple[List[Dict], List[Dict]]:
+        """迁移并校验全部记录，返回 (有效记录, 无效记录)；无效记录保持原样，不含补全的缺省值"""
+        valid, invalid = [], []
+        for record in records:
+            try:
+                valid.append(self.validate(self.migrate(dict(record), from_version)))
+            except (ValueError, TypeError, KeyError):
+                invalid.append(record)
+        return valid, invalid
+
+
+NUMBER = (int, float)
+
+SCHEMAS = {
+    "todos": Schema("todos", 1, [
+        Field("id", NUMBER, required=True),
+        Field("text", (str,), required=True),
+        Field("done", (bool,), default=lambda: False),
+        Field("start", (str,), default=_now, iso=True),
+        Field("end", (str,), default=_now, iso=True),
+        Field("created", (str,), required=True, iso=True),
+        Field("completed", (str,)),
+    ]),
+    "cards": Schema("cards", 1, [
+        Field("title", (str,), required=True),
+        Field("answer", (str,), default=lambda: ""),
+        Field("tags", (list,), default=list),
+        Field("folder", (str,), default=lambda: "默认文件夹"),
+        Field("proficiency", (int,), default=lambda: 0),
+        Field("last_practiced", (str,), default=_now, iso=True),
+    ]),
+    "notes": Schema("notes", 1, [
+        Field("id", NUMBER, required=True),
+        Field("title", (str,), default=lambda: "新笔记"),
+        Field("tags", (list,), default=list),
+        Field("path", (str,), default=lambda: ""),
+        Field("created", (str,), default=lambda: ""),
+        Field("modified", (str,), default=lambda: ""),
+    ]),
+    "pomo_records": Schema("pomo_records", 1, [
+        Field("duration", NUMBER, default=lambda: 0),
+        Field("timestamp", (str,), required=True, iso=True),
+    ]),
+    "sessions": Schema("sessions", 3, [
+        Field("id", (str,), required=True),
+        Field("title", (str,), default=lambda: "新会话"),
+        Field("history", (list,), default=list),
+        Field("created", (str,), default=_now),
+        Field("updated", (str,), default=_now),
+        Field("message_count", (int,), default=lambda: 0),
+        Field("byte_size", (int,), default=lambda: 0),
+        Field("summary", (dict, list), default=dict),  # 滚动摘要 {text, upto, updated}
+    ], migrations={1: session_stats}),
+}
@@ -1,16 +1,138 @@
 # search.py
 import os
 import json
+import html
+import logging
 import requests
+from collections import deque
 import markdown  # 新增导入
 from datetime import datetime
 from PyQt5.QtWidgets import *
 from PyQt5.QtCore import *
 from PyQt5.QtGui import *
 from PyQt5.QtWebEngineWidgets import QWebEngineView  # 关键修复
-
-SEARCH_DATA_DIR = "data/search_sessions"
-os.makedirs(SEARCH_DATA_DIR, exist_ok=True)
+from modules.data_manager import DataManager
+from modules.schema import session_stats
+from modules.chat_stream import (SSEParser, ChunkCoalescer, ChatClient, API_URL, POOL_SIZE,
+                                 COALESCE_INTERVAL, COALESCE_BYTES, cache_key, RESPONSE_CACHE_DIR,
+                                 RESPONSE_CACHE_BYTES, RESPONSE_CACHE_TTL)
+from modules.cache import DiskCache
+from modules.text_index import snippet
+from modules.chat_context import ContextBuilder, CONTEXT_TOKEN_BUDGET
+from modules.markdown_render import RenderCache, RENDER_CACHE_DIR
+from modules.web_assets import BASE_URL, MATHJAX_CONFIG, MATHJAX_SCRIPT
+from modules.formula_cache import FormulaCache, FORMULA_CACHE_DIR, attach_formula_cache, formula_scripts
+from modules.session_model import SessionListModel, SORT_FIELDS
+from modules import serializers
+
+SESSION_DATASET = "sessions"
+MAX_STREAMS = POOL_SIZE  # 同时进行的流式请求上限，与连接池大小一致
+SESSION_INDEX = "session_index"  # 会话全文索引
+SEARCH_DELAY_MS = 150            # 输入停顿多久后执行检索
+SEARCH_LIMIT = 20
+
+logger = logging.getLogger('SearchModule')
+
+
+def session_text(session):
+    """会话的可检索文本：标题 + 全部消息"""
+    return "\n".join([session.get("title", "")] +
+                     [msg.get("content", "") for msg in session.get("history", [])])
+
+# 聊天页面的JS接口：已完成的消息以渲染好的HTML插入；流式内容先以纯文本追加，每个动画帧最多写一次DOM
+CHAT_JS = """
+const chat = {
+    list: document.getElementById('messages'),
+    target: null,
+    pending: '',
+    scheduled: false,
+    nearBottom() {
+        const el = document.documentElement;
+        return el.scrollHeight - el.scrollTop - el.clientHeight < 80;
+    },
+    scrollToBottom() {
+        window.scrollTo(0, document.documentElement.scrollHeight);
+    },
+    typeset(el) {
+        formulas.typeset([el]);  // 已缓存的公式以SVG嵌入，只排版新公式
+    },
+    createMessage(msg) {
+        const div = document.createElement('div');
+        div.className = msg.role;
+        if (msg.html !== undefined) {
+            div.innerHTML = msg.html;
+        } else {
+            div.classList.add('streaming');
+            div.textContent = msg.text || '';
+        }
+        return div;
+    },
+    addMessage(role, html) {
+        const div = this.createMessage({role: role, html: html});
+        this.list.appendChild(div);
+        this.typeset(div);
+        this.scrollToBottom();
+        return div;
+    },
+    addText(role, text) {
+        const div = this.createMessage({role: role, text: text});
+        this.list.appendChild(div);
+        this.scrollToBottom();
+        return div;
+    },
+    setMessages(messages, streaming) {
+        this.target = null;
+        this.pending = '';
+        const fragment = document.createDocumentFragment();
+        for (const msg of messages) {
+            fragment.appendChild(this.createMessage(msg));
+        }
+        this.list.replaceChildren(fragment);
+        this.typeset(this.list);
+        if (streaming) {
+            // 该会话仍在接收回复：继续追加到最后一条assistant消息
+            const last = this.list.lastElementChild;
+            this.target = last && last.classList.contains('streaming') ? last : this.addText('assistant', '');
+        }
+        this.scrollToBottom();
+    },
+    beginAssistant() {
+        this.flush();
+        this.target = this.addText('assistant', '');
+    },
+    appendDelta(text) {
+        this.pending += text;
+        if (!this.scheduled) {
+            this.scheduled = true;
+            requestAnimationFrame(() => this.flush());
+        }
+    },
+    flush() {
+        this.scheduled = false;
+        if (!this.pending) return;
+        if (!this.target) this.target = this.addText('assistant', '');
+        const follow = this.nearBottom();
+        this.target.insertAdjacentText('beforeend', this.pending);
+        this.pending = '';
+        if (follow) this.scrollToBottom();
+    },
+    finishAssistant(html) {
+        // 回复结束后用渲染好的HTML替换纯文本
+        this.pending = '';
+        if (!this.target) return;
+        this.target.innerHTML = html;
+        this.target.classList.remove('streaming');
+        this.typeset(this.target);
+        this.target = null;
+    },
+    removeLast(role) {
+        this.pending = '';
+        const last = this.list.lastElementChild;
+        if (last && last.classList.contains(role)) last.remove();
+        this.target = null;
+    }
+};
+"""
 
 
 
@@ -19,40 +141,79 @@ class StreamWorker(QThread):
     finished = pyqtSignal()
     error_occurred = pyqtSignal(str)
 
-    def __init__(self, api_key, messages, parent=None):
+    def __init__(self, client, api_key, messages, parent=None,
+                 coalesce_interval=COALESCE_INTERVAL, coalesce_bytes=COALESCE_BYTES, cache=None):
         super().__init__(parent)
+        self.client = client
         self.api_key = api_key
         self.messages = messages
+        self.cache = cache  # 回复缓存，为None时不读写缓存
+        self.coalesce_interval = coalesce_interval
+        self.coalesce_bytes = coalesce_bytes
+
+    def replay(self, text):
+        """按与网络流相同的信号发出缓存的回复"""
+        for start in range(0, len(text), self.coalesce_bytes):
+            if self.isInterruptionRequested():
+                break
+            self.chunk_received.emit(text[start:start + self.coalesce_bytes])
+
+    def read_events(self, events, reader, parts, coalescer):
+        """处理一批SSE事件，返回"done"（收到[DONE]）、"error"（解析失败，结束读取）或None"""
+        for event in events:
+            if event == b"[DONE]":
+                return "done"
+            if b'"content"' not in event:
+                continue  # 只含角色等信息的增量
+            try:
+                delta = reader.loads(event)["choices"][0]["delta"]
+                content = delta.get("content") or ""
+            except Exception as e:
+                self.error_occurred.emit(f"解析错误: {str(e)}")
+                return "error"
+            if content:
+                parts.append(content)
+                coalescer.add(content)
+        return None
 
     def run(self):
         try:
-            headers = {"Authorization": f"Bearer {self.api_key.strip()}"}
-            data = {
-                "messages": self.messages,
-                "model": "deepseek-chat",
-                "stream": True  # 启用流式传输
-            }
-            
-            with requests.post(
-                "https://api.deepseek.com/v1/chat/completions",
-                headers=headers,
-                json=data,
-                stream=True,
-                timeout=10
-            ) as response:
-                for line in response.iter_lines():
-                    if line:
-                        decoded_line = line.decode('utf-8')
-                        if decoded_line.startswith("data: "):
-                            chunk = decoded_line[6:]
-                            if chunk == "[DONE]":
-                                break
-                            try:
-                                chunk_json = json.loads(chunk)
-                                content = chunk_json["choices"][0]["delta"].get("content", "")
-                                self.chunk_received.emit(content)
-                            except Exception as e:
-                                self.error_occurred.emit(f"解析错误: {str(e)}")
+            key = cache_key(self.client.model, self.messages) if self.cache is not None else None
+            cached = self.cache.get(key) if key else None
+            if cached is not None:
+                self.replay(cached.decode("utf-8"))
+                return
+
+            # 复用客户端的连接池，后续消息无需重新握手
+            with self.client.stream(self.api_key, self.messages) as response:
+                response.raise_for_status()  # 401/429/500等错误响应没有SSE事件，不检查会变成空回复
+                parser = SSEParser()
+                reader = serializers.json_reader()
+                parts = []
+                # 细碎的增量先合并再发往GUI线程
+                coalescer = ChunkCoalescer(self.chunk_received.emit,
+                                           self.coalesce_interval, self.coalesce_bytes)
+                status = None
+                try:
+                    for raw in response.iter_content(chunk_size=None):
+                        if self.isInterruptionRequested():
+                            break
+                        status = self.read_events(parser.feed(raw), reader, parts, coalescer)
+                        if status:
+                            break
+                    else:
+                        # 流结束时最后一个事件可能没有以空行结尾
+                        status = self.read_events(parser.close(), reader, parts, coalescer)
+                except Exception:
+                    coalescer.discard()  # 出错后部分回复会被丢弃，定时器不能再发出内容
+                    raise
+                if status == "error":
+                    coalescer.discard()
+                    return  # 已报告错误，部分回复已被丢弃，不再发出剩余内容
+                coalescer.flush()
+                # 只缓存完整结束的回复
+                if status == "done" and key and parts:
+                    self.cache.put(key, "".join(parts).encode("utf-8"))
 
         except requests.exceptions.ConnectionError:
             self.error_occurred.emit("网络连接失败，请检查网络设置")
@@ -68,21 +229,56 @@ class StreamWorker(QThread):
 
 
 
+class SummaryWorker(QThread):
+    """后台生成会话的滚动摘要"""
+    summarized = pyqtSignal(str)
+    failed = pyqtSignal(str)
+
+    def __init__(self, client, api_key, messages, parent=None):
+        super().__init__(parent)
+        self.client = client
+        self.api_key = api_key
+        self.messages = messages
+
+    def run(self):
+        try:
+            self.summarized.emit(self.client.complete(self.api_key, self.messages))
+        except Exception as e:
+            self.failed.emit(str(e))
+
+
+
 class SearchModule(QWidget):
     new_note_signal = pyqtSignal(dict)
     
-    def __init__(self):
+    def __init__(self, data_manager=None, api_url=API_URL, warm_up=True,
+                 cache_bytes=RESPONSE_CACHE_BYTES, cache_ttl=RESPONSE_CACHE_TTL,
+                 context_budget=CONTEXT_TOKEN_BUDGET, formula_cache=None):
         super().__init__()
-        self.sessions = []
+        self.data_manager = data_manager or DataManager()
+        self.client = ChatClient(api_url)
+        # 相同上下文的请求直接重放缓存的回复；cache_bypass中的会话不使用缓存
+        self.response_cache = DiskCache(
+            os.path.join(self.data_manager.data_dir, RESPONSE_CACHE_DIR), cache_bytes, cache_ttl)
+        self.cache_bypass = set(self.data_manager.get_value("response_cache_bypass", []))
+        # 按token预算组装上下文，更早的对话折叠为后台生成的摘要
+        self.context_builder = ContextBuilder(context_budget)
+        self.summary_workers = {}  # 会话ID -> 正在生成摘要的SummaryWorker
+        # 消息渲染结果按内容哈希缓存（内存 + 磁盘），重新打开会话时无需重新渲染
+        self.renderer = RenderCache(os.path.join(self.data_manager.data_dir, RENDER_CACHE_DIR))
+        self.formula_cache = formula_cache or FormulaCache(
+            os.path.join(self.data_manager.data_dir, FORMULA_CACHE_DIR))
+        self.warm_up = warm_up  # 切换到搜索页时预先建立连接
+        # 会话索引（id、标题、时间、消息数、字节数），历史在打开时加载；列表按页显示
+        self.session_model = SessionListModel(self.data_manager.get_value("session_sort", "updated"))
         self.current_session_id = None
         self.api_key = ""
-        self.stream_worker = None
-        self.accumulated_response = ""
+        self.streams = {}              # 会话ID -> 流状态（工作线程、已收到的回复、请求消息）
+        self.stream_queue = deque()    # 等待启动的会话ID
+        self.chat_ready = False  # 聊天页面只加载一次，之后通过JS接口增量更新
+        self.pending_js = []
         self.init_ui()
         self.load_sessions()
-        self.scroll_timer = QTimer()
-        self.scroll_timer.setSingleShot(True)
-        self.scroll_timer.timeout.connect(self.execute_scroll)
 
 
     def init_ui(self):
@@ -98,19 +294,40 @@ class SearchModule(QWidget):
         self.search_bar = QLineEdit()
         self.search_bar.setPlaceholderText("搜索会话...")
         self.search_bar.textChanged.connect(self.filter_sessions)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.timeout.connect(self.run_search)
+        
+        # 排序方式
+        self.sort_box = QComboBox()
+        for field, label in SORT_FIELDS.items():
+            self.sort_box.addItem(label, field)
+        self.sort_box.setCurrentIndex(self.sort_box.findData(self.session_model.sort_field))
+        self.sort_box.currentIndexChanged.connect(self.change_sort)
+        
+        # 会话列表：模型按需分页，行高固定便于快速滚动
+        self.session_list = QListView()
+        self.session_list.setModel(self.session_model)
+        self.session_list.setUniformItemSizes(True)
+        self.session_list.clicked.connect(self.load_session)
+        
+        # 检索结果（带命中片段）
+        self.search_results = QListWidget()
+        self.search_results.itemClicked.connect(self.load_session)
         
-        # 会话列表
-        self.session_list = QListWidget()
-        self.session_list.itemClicked.connect(self.load_session)
-        self.session_list.setContextMenuPolicy(Qt.CustomContextMenu)
-        self.session_list.customContextMenuRequested.connect(self.show_session_menu)
+        self.session_stack = QStackedWidget()
+        for view in (self.session_list, self.search_results):
+            view.setContextMenuPolicy(Qt.CustomContextMenu)
+            view.customContextMenuRequested.connect(self.show_session_menu)
+            self.session_stack.addWidget(view)
         
         # 新建会话按钮
         self.new_btn = QPushButton("新建会话")
         self.new_btn.clicked.connect(self.create_session)
         
         session_layout.addWidget(self.search_bar)
-        session_layout.addWidget(self.session_list, 1)
+        session_layout.addWidget(self.sort_box)
+        session_layout.addWidget(self.session_stack, 1)
         session_layout.addWidget(self.new_btn)
 
         # 右侧聊天区域
@@ -119,7 +336,9 @@ class SearchModule(QWidget):
         
         # 聊天历史
         self.chat_history = QWebEngineView()
-        self.chat_history.setHtml(self.get_base_html(""))
+        self.chat_history.loadFinished.connect(self.on_chat_loaded)
+        attach_formula_cache(self.chat_history, self.formula_cache)
+        self.chat_history.setHtml(self.get_base_html(), BASE_URL)
         
         # 输入区域
         input_layout = QHBoxLayout()
@@ -138,7 +357,7 @@ class SearchModule(QWidget):
         main_layout.addWidget(self.chat_panel, 2)
         
         self.setStyleSheet("""
-            QListWidget, QWebEngineView, QTextEdit {
+            QListWidget, QListView, QWebEngineView, QTextEdit {
                 border: 1px solid #e0e0e0;
                 border-radius: 8px;
             }
@@ -151,7 +370,10 @@ class SearchModule(QWidget):
         """)
 
     def show_session_menu(self, pos):
-        item = self.session_list.itemAt(pos)
+        view = self.session_stack.currentWidget()
+        item = view.itemAt(pos) if view is self.search_results else view.indexAt(pos)
+        if item is not None and not isinstance(item, QListWidgetItem) and not item.isValid():
+            item = None
         menu = QMenu()
         
         delete_action = QAction("删除会话", self)
@@ -160,9 +382,15 @@ class SearchModule(QWidget):
         convert_action = QAction("转为笔记", self)
         convert_action.triggered.connect(lambda: self.convert_to_note(item))
         
+        cache_action = QAction("使用回复缓存", self)
+        cache_action.setCheckable(True)
         if item:
-            menu.addActions([delete_action, convert_action])
-        menu.exec_(self.session_list.mapToGlobal(pos))
+            cache_action.setChecked(item.data(Qt.UserRole) not in self.cache_bypass)
+        cache_action.toggled.connect(lambda checked: self.set_cache_enabled(item, checked))
+        
+        if item:
+            menu.addActions([delete_action, convert_action, cache_action])
+        menu.exec_(view.mapToGlobal(pos))
 
     def create_session(self):
         session_id = datetime.now().strftime("%Y%m%d%H%M%S%f")
@@ -171,12 +399,17 @@ class SearchModule(QWidget):
             "title": "新会话",
             "history": [],
             "created": datetime.now().isoformat(),
-            "updated": datetime.now().isoformat()
+            "updated": datetime.now().isoformat(),
+            "message_count": 0,
+            "byte_size": 0,
+            "summary": {}
         }
-        self.sessions.append(session)
         self.save_session(session)
-        self.update_session_list()
+        self.session_model.upsert(session)
         self.current_session_id = session_id
+        self.select_current_session()
+        self.call_js("setMessages", [], False)
+        self.update_send_button()
 
     def delete_session(self, item):
         session_id = item.data(Qt.UserRole)
@@ -186,16 +419,31 @@ class SearchModule(QWidget):
             QMessageBox.Yes | QMessageBox.No
         )
         if confirm == QMessageBox.Yes:
-            # 删除文件
-            file_path = os.path.join(SEARCH_DATA_DIR, f"{session_id}.json")
-            if os.path.exists(file_path):
-                os.remove(file_path)
-            self.sessions = [s for s in self.sessions if s["id"] != session_id]
-            self.update_session_list()
+            state = self.streams.get(session_id)
+            if state and state["worker"]:
+                state["worker"].requestInterruption()  # 线程结束后由handle_stream_finished清理
+            elif state:
+                self.streams.pop(session_id)
+            self.data_manager.delete_record(SESSION_DATASET, session_id)
+            self.data_manager.unindex_document(SESSION_INDEX, session_id)
+            if session_id in self.cache_bypass:
+                self.cache_bypass.discard(session_id)
+                self.data_manager.set_value("response_cache_bypass", sorted(self.cache_bypass))
+            self.session_model.remove(session_id)
+            if self.search_bar.text().strip():
+                self.run_search()
+
+    def set_cache_enabled(self, item, enabled):
+        """切换单个会话是否使用回复缓存"""
+        session_id = item.data(Qt.UserRole)
+        if enabled:
+            self.cache_bypass.discard(session_id)
+        else:
+            self.cache_bypass.add(session_id)
+        self.data_manager.set_value("response_cache_bypass", sorted(self.cache_bypass))
 
     def convert_to_note(self, item):
-        session_id = item.data(Qt.UserRole)
-        session = next((s for s in self.sessions if s["id"] == session_id), None)
+        session = self.get_session(item.data(Qt.UserRole))
         if not session:
             return
 
@@ -239,42 +487,88 @@ class SearchModule(QWidget):
         return ["默认文件夹", "学习笔记", "工作记录"]
 
     def filter_sessions(self):
-        keyword = self.search_bar.text().lower()
-        for i in range(self.session_list.count()):
-            item = self.session_list.item(i)
-            item.setHidden(keyword not in item.text().lower())
+        # 输入停顿后再检索，避免每个按键都查询
+        self.search_timer.start(SEARCH_DELAY_MS)
+
+    def run_search(self):
+        """在全部会话的消息中检索，按相关度列出会话并显示命中片段"""
+        query = self.search_bar.text().strip()
+        if not query:
+            self.update_session_list()
+            return
+        results = self.data_manager.search_text(SESSION_INDEX, query, SEARCH_LIMIT)
+        self.search_results.clear()
+        self.session_stack.setCurrentWidget(self.search_results)
+        for session_id, _ in results:
+            session = self.session_model.get(session_id)
+            if session is None:
+                continue
+            # 未打开过的会话只为生成片段读取一次，不常驻内存
+            record = session if "history" in session else \
+                self.data_manager.load_record(SESSION_DATASET, session_id) or session
+            item = QListWidgetItem()
+            item.setData(Qt.UserRole, session_id)
+            label = QLabel(f"<b>{html.escape(session['title'])}</b><br>"
+                           f"<span style='color:#666'>{snippet(session_text(record), query)}</span>")
+            label.setWordWrap(True)
+            label.setContentsMargins(6, 4, 6, 4)
+            item.setSizeHint(label.sizeHint())
+            self.search_results.addItem(item)
+            self.search_results.setItemWidget(item, label)
 
     def load_sessions(self):
-        self.sessions = []
-        for file in os.listdir(SEARCH_DATA_DIR):
-            if file.endswith(".json"):
-                with open(os.path.join(SEARCH_DATA_DIR, file), "r") as f:
-                    self.sessions.append(json.load(f))
-        self.update_session_list()
+        # 启动时只读取会话索引，不解析消息历史
+        self.session_model.reset(self.data_manager.load_index(SESSION_DATASET))
+        # 首次使用时在后台为已有会话建立全文索引
+        self.data_manager.ensure_index(SESSION_INDEX, lambda: [
+            (s["id"], session_text(s)) for s in self.data_manager.load_records(SESSION_DATASET)])
+
+    def get_session(self, session_id):
+        """返回会话，首次访问时从存储加载其消息历史"""
+        session = self.session_model.get(session_id)
+        if session is not None and "history" not in session:
+            record = self.data_manager.load_record(SESSION_DATASET, session_id) or {}
+            session["history"] = record.get("history", [])
+            session["summary"] = record.get("summary") or {}
+        return session
 
     def update_session_list(self):
-        self.session_list.clear()
-        for session in sorted(self.sessions, 
-                            key=lambda x: x["updated"], reverse=True)[:5]:
-            item = QListWidgetItem(session["title"])
-            item.setData(Qt.UserRole, session["id"])
-            self.session_list.addItem(item)
+        """显示会话列表；检索状态下刷新检索结果"""
+        if self.search_bar.text().strip():
+            self.run_search()
+            return
+        self.session_stack.setCurrentWidget(self.session_list)
+        self.select_current_session()
+
+    def select_current_session(self):
+        row = self.session_model.row_of(self.current_session_id)
+        if row >= 0:
+            self.session_list.setCurrentIndex(self.session_model.index(row))
+
+    def change_sort(self):
+        field = self.sort_box.currentData()
+        self.session_model.set_sort(field)
+        self.data_manager.set_value("session_sort", field)
+        self.select_current_session()
 
     def save_session(self, session):
-        file_path = os.path.join(SEARCH_DATA_DIR, f"{session['id']}.json")
-        with open(file_path, "w") as f:
-            json.dump(session, f, indent=2)
+        if "history" not in session:
+            return  # 历史尚未加载的会话没有改动
+        self.data_manager.save_record(SESSION_DATASET, session_stats(session))
+        self.data_manager.index_document(SESSION_INDEX, session["id"], session_text(session))
 
     def load_session(self, item):
         session_id = item.data(Qt.UserRole)
-        session = next((s for s in self.sessions if s["id"] == session_id), None)
+        session = self.get_session(session_id)
         if session:
             self.current_session_id = session_id
-            html = self.get_base_html("\n".join(
-                [f"<div class='{msg['role']}'>{msg['content']}</div>" 
-                 for msg in session["history"]]
-            ))
-            self.chat_history.setHtml(html)
+            streaming = session_id in self.streams
+            messages = [self.message_payload(msg) for msg in session["history"]]
+            if streaming and messages and messages[-1]["role"] == "assistant":
+                # 正在接收的回复保持纯文本，结束后再渲染
+                messages[-1] = {"role": "assistant", "text": session["history"][-1]["content"]}
+            self.call_js("setMessages", messages, streaming)
+            self.update_send_button()
 
     def show_error(self, message):
         """统一错误提示方法"""
@@ -353,80 +647,171 @@ class SearchModule(QWidget):
         if not self.api_key:
             QMessageBox.warning(self, "警告", "请先在设置中配置API密钥")
             return
+        if self.current_session_id in self.streams:
+            return  # 当前会话的回复尚未结束
             
         user_input = self.input_field.toPlainText().strip()
         if not user_input:
             QMessageBox.warning(self, "警告", "请输入消息内容")
             return
 
-        session = next(s for s in self.sessions if s["id"] == self.current_session_id)
+        session_id = self.current_session_id
+        session = self.get_session(session_id)
         session["history"].append({"role": "user", "content": user_input})
+        self.call_js("addMessage", "user", self.render(user_input))
+        self.call_js("beginAssistant")
         self.input_field.clear()
-        self.send_btn.setEnabled(False)  # 禁用发送按钮
 
-        # 创建流式工作线程
-        self.stream_worker = StreamWorker(
-            self.api_key,
-            session["history"][-5:]
-        )
-        self.stream_worker.chunk_received.connect(self.handle_stream_chunk)
-        self.stream_worker.finished.connect(self.handle_stream_finished)
-        self.stream_worker.error_occurred.connect(self.handle_stream_error)
-        self.stream_worker.start()
-
-    def handle_stream_chunk(self, content):
-        self.accumulated_response += content
-        session = next(s for s in self.sessions if s["id"] == self.current_session_id)
+        # 每个会话独立的流状态；超过并发上限时排队
+        self.streams[session_id] = {"worker": None, "text": "",
+                                    "messages": self.context_builder.build(session)}
+        self.stream_queue.append(session_id)
+        self.update_send_button()
+        self.start_queued_streams()
+
+    def start_queued_streams(self):
+        """在并发上限内启动排队的请求"""
+        running = sum(1 for state in self.streams.values() if state["worker"] is not None)
+        while self.stream_queue and running < MAX_STREAMS:
+            session_id = self.stream_queue.popleft()
+            state = self.streams.get(session_id)
+            if state is None:
+                continue
+            cache = None if session_id in self.cache_bypass else self.response_cache
+            worker = StreamWorker(self.client, self.api_key, state["messages"], cache=cache)
+            worker.chunk_received.connect(lambda text, sid=session_id: self.handle_stream_chunk(sid, text))
+            worker.finished.connect(lambda sid=session_id: self.handle_stream_finished(sid))
+            worker.error_occurred.connect(lambda msg, sid=session_id: self.handle_stream_error(sid, msg))
+            state["worker"] = worker
+            worker.start()
+            running += 1
+
+    def update_send_button(self):
+        # 只有当前会话正在回复时禁用发送按钮
+        self.send_btn.setEnabled(self.current_session_id not in self.streams)
+
+    def handle_stream_chunk(self, session_id, content):
+        state = self.streams.get(session_id)
+        session = self.get_session(session_id)
+        if state is None or session is None:
+            return  # 会话已删除
+        state["text"] += content
         
-        # 更新最后一条assistant消息
+        # 更新该会话最后一条assistant消息
         if session["history"] and session["history"][-1]["role"] == "assistant":
-            session["history"][-1]["content"] = self.accumulated_response
+            session["history"][-1]["content"] = state["text"]
         else:
-            session["history"].append({"role": "assistant", "content": self.accumulated_response})
+            session["history"].append({"role": "assistant", "content": state["text"]})
         
-        # 实时更新显示
-        html = self.get_base_html("\n".join(
-            [f"<div class='{msg['role']}'>{msg['content']}</div>" 
-             for msg in session["history"]]
-        ))
-        self.chat_history.setHtml(html)
-        self.chat_history.page().runJavaScript("window.scrollTo(0, document.body.scrollHeight);")
-        self.scroll_timer.start(100) 
-
-    def handle_stream_finished(self):
-        session = next(s for s in self.sessions if s["id"] == self.current_session_id)
-        session["updated"] = datetime.now().isoformat()
+        # 只把新增内容追加到当前显示的会话，页面按动画帧批量渲染
+        if session_id == self.current_session_id:
+            self.call_js("appendDelta", content)
+
+    def handle_stream_finished(self, session_id):
+        state = self.streams.pop(session_id, None)
+        if state and state["worker"]:
+            state["worker"].wait()  # finished在run()末尾发出，等线程真正退出后再释放
+        session = self.get_session(session_id)
+        if session is not None:
+            if session_id == self.current_session_id and session["history"] \
+                    and session["history"][-1]["role"] == "assistant":
+                self.call_js("finishAssistant", self.render(session["history"][-1]["content"]))
+            session["updated"] = datetime.now().isoformat()
+            self.save_session(session)
+            self.session_model.upsert(session)  # 只移动该会话所在的行
+            self.refresh_summary(session)
+        self.update_send_button()
+        self.start_queued_streams()
+
+    def refresh_summary(self, session):
+        """有消息移出上下文窗口时，在后台把它们并入会话摘要"""
+        session_id = session["id"]
+        if session_id in self.summary_workers or not self.api_key:
+            return
+        start, end = self.context_builder.pending_summary(session)
+        if start >= end:
+            return
+        worker = SummaryWorker(self.client, self.api_key,
+                               self.context_builder.summary_request(session, start, end))
+        worker.summarized.connect(lambda text, sid=session_id: self.handle_summary(sid, text, end))
+        worker.failed.connect(lambda msg, sid=session_id: logger.warning(f"会话{sid}摘要生成失败: {msg}"))
+        worker.finished.connect(lambda sid=session_id: self.summary_finished(sid))
+        self.summary_workers[session_id] = worker
+        worker.start()
+
+    def summary_finished(self, session_id):
+        worker = self.summary_workers.pop(session_id, None)
+        if worker:
+            worker.wait()
+
+    def handle_summary(self, session_id, text, upto):
+        session = self.get_session(session_id)
+        if session is None:
+            return
+        session["summary"] = {"text": text, "upto": upto, "updated": datetime.now().isoformat()}
         self.save_session(session)
-        self.update_session_list()
-        self.accumulated_response = ""
-        self.send_btn.setEnabled(True)
 
-    def handle_stream_error(self, error_msg):
+    def handle_stream_error(self, session_id, error_msg):
         self.show_error(error_msg)  # 现在可以正常调用
-        self.send_btn.setEnabled(True)
-        self.accumulated_response = ""
         
         # 清理无效的会话记录
-        if self.current_session_id:
-            session = next((s for s in self.sessions if s["id"] == self.current_session_id), None)
-            if session and session["history"][-1]["role"] == "assistant":
-                session["history"].pop()  # 删除不完整的回复
-                self.save_session(session)
+        session = self.get_session(session_id)
+        if session and session["history"] and session["history"][-1]["role"] == "assistant":
+            session["history"].pop()  # 删除不完整的回复
+            self.save_session(session)
+        if session_id in self.streams:
+            self.streams[session_id]["text"] = ""
+        if session_id == self.current_session_id:
+            self.call_js("removeLast", "assistant")
 
     def set_api_key(self, key):
         self.api_key = key
 
-    def get_base_html(self, content):
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self.warm_up and self.api_key:
+            self.client.warm_up()
+
+    # --------------------- 聊天页面 ---------------------
+    def render(self, text):
+        """渲染消息（命中缓存时不重新渲染），已排版过的公式直接嵌入SVG"""
+        return self.formula_cache.inject(self.renderer.render(text))
+
+    def message_payload(self, msg):
+        """发送给页面的消息：角色 + 渲染后的HTML"""
+        return {"role": msg["role"], "html": self.render(msg["content"])}
+
+    def on_chat_loaded(self, ok):
+        """页面加载完成后执行排队的JS调用"""
+        self.chat_ready = ok
+        if ok:
+            for script in self.pending_js:
+                self.chat_history.page().runJavaScript(script)
+            self.pending_js = []
+
+    def call_js(self, method, *args):
+        """调用页面中的chat接口；页面未就绪时先排队"""
+        script = f"chat.{method}({', '.join(json.dumps(a, ensure_ascii=False) for a in args)});"
+        if self.chat_ready:
+            self.chat_history.page().runJavaScript(script)
+        else:
+            self.pending_js.append(script)
+
+    def get_base_html(self):
         return f"""
         <!DOCTYPE html>
         <html>
         <head>
+            <meta charset="utf-8">
             <style>
                 body {{ 
                     font-family: Segoe UI; 
                     padding: 20px;
                     background: #f8f9fa;
                 }}
+                .streaming {{
+                    white-space: pre-wrap;
+                }}
                 .user {{ 
                     background: #e3f2fd;
                     padding: 10px;
@@ -446,22 +831,15 @@ class SearchModule(QWidget):
                     border-radius: 8px;
                 }}
             </style>
-            <script src="https://polyfill.io/v3/polyfill.min.js?features=es6"></script>
-            <script id="MathJax-script" async src="https://cdn.jsdelivr.net/npm/mathjax@3/es5/tex-mml-chtml.js"></script>
+            {MATHJAX_CONFIG}
+            {MATHJAX_SCRIPT}
         </head>
         <body>
-            {content}
+            <div id="messages"></div>
+            {formula_scripts()}
+            <script>
+            {CHAT_JS}
+            </script>
         </body>
         </html>
         """
-
-    def execute_scroll(self):
-        self.chat_history.page().runJavaScript("""
-            let container = document.documentElement;
-            if(container) {
-                container.scrollTo({
-                    top: container.scrollHeight,
-                    behavior: 'smooth'
-                });
-            }
-        """)
\ No newline at end of file
@@ -0,0 +1,100 @@
+# serializers.py
+import json
+import logging
+from typing import Any, Dict
+
+try:
+    import orjson  # 可选：更快的JSON实现
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack  # 可选：二进制格式
+except ImportError:
+    msgpack = None
+
+logger = logging.getLogger('Serializers')
+
+DEFAULT_FORMAT = "json"
+
+
+class JsonSerializer:
+    """标准库JSON，默认使用紧凑格式"""
+    name = "json"
+
+    def __init__(self, indent=None):
+        self.indent = indent
+        self.separators = None if indent else (",", ":")
+
+    def dumps(self, data: Any) -> bytes:
+        return json.dumps(data, ensure_ascii=False, indent=self.indent,
+                          separators=self.separators).encode("utf-8")
+
+    def loads(self, raw: bytes) -> Any:
+        return json.loads(raw.decode("utf-8"))
+
+
+class OrjsonSerializer:
+    """orjson后端，输出仍是标准JSON"""
+    name = "orjson"
+
+    def dumps(self, data: Any) -> bytes:
+        # OPT_NON_STR_KEYS：与json模块一样允许数字作为字典键
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+
+    def loads(self, raw: bytes) -> Any:
+        return orjson.loads(raw)
+
+
+class MsgpackSerializer:
+    """msgpack二进制格式"""
+    name = "msgpack"
+
+    def dumps(self, data: Any) -> bytes:
+        return msgpack.packb(data, use_bin_type=True)
+
+    def loads(self, raw: bytes) -> Any:
+        return msgpack.unpackb(raw, raw=False, strict_map_key=False)
+
+
+SERIALIZERS = {
+    "json": JsonSerializer(),
+    "json-pretty": JsonSerializer(indent=2),
+}
+if orjson is not None:
+    SERIALIZERS["orjson"] = OrjsonSerializer()
+if msgpack is not None:
+    SERIALIZERS["msgpack"] = MsgpackSerializer()
+
+
+def get_serializer(name: str):
+    """按名称取序列化器，依赖未安装时回退到JSON"""
+    if name not in SERIALIZERS:
+        logger.warning(f"序列化格式{name}不可用，改用{DEFAULT_FORMAT}")
+        return SERIALIZERS[DEFAULT_FORMAT]
+    return SERIALIZERS[name]
+
+
+def json_reader():
+    """读取JSON时优先使用orjson"""
+    return SERIALIZERS.get("orjson", SERIALIZERS["json"])
+
+
+def detect(raw: bytes):
+    """根据文件内容判断格式：JSON以 { 或 [ 开头，否则视为msgpack"""
+    head = raw.lstrip()[:1]
+    if head in (b"{", b"[") or not raw.strip():
+        return json_reader()
+    if "msgpack" not in SERIALIZERS:
+        raise ValueError("数据为msgpack格式，但未安装msgpack")
+    return SERIALIZERS["msgpack"]
+
+
+def loads(raw: bytes) -> Any:
+    """自动识别格式并反序列化"""
+    return detect(raw).loads(raw)
+
+
+def resolve_formats(config: Dict[str, str]) -> Dict[str, Any]:
+    """把设置中的 文件名 -> 格式名 映射解析为序列化器"""
+    return {filename: get_serializer(name) for filename, name in (config or {}).items()}
@@ -0,0 +1,165 @@
+# session_model.py
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex
+
+PAGE_SIZE = 100  # 每次滚动到底部时多显示的行数
+SORT_FIELDS = {"updated": "按更新时间", "created": "按创建时间"}
+
+
+class SessionListModel(QAbstractListModel):
+    """会话索引的列表模型：按时间从新到旧排列，滚动时分页加载，单个会话变化只更新对应的行"""
+
+    def __init__(self, sort_field: str = "updated", page_size: int = PAGE_SIZE, parent=None):
+        super().__init__(parent)
+        self.sort_field = sort_field if sort_field in SORT_FIELDS else "updated"
+        self.page_size = page_size
+        self.sessions = {}   # 会话ID -> 会话索引
+        self.keys = {}       # 会话ID -> 当前排序键
+        self.entries = []    # 升序排列的排序键；第row行对应 entries[-1 - row]
+        self.loaded = 0      # 已向视图公开的行数
+        self.changing = False  # 结构变化期间视图可能在信号中再次请求分页，此时忽略
+
+    def _key(self, session: Dict):
+        return session.get(self.sort_field) or "", session["id"]
+
+    def _row(self, pos: int) -> int:
+        return len(self.entries) - 1 - pos
+
+    @contextmanager
+    def _changing(self):
+        self.changing = True
+        try:
+            yield
+        finally:
+            self.changing = False
+
+    # --------------------- Qt接口 ---------------------
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.loaded
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.changing and self.loaded < len(self.entries)
+
+    def fetchMore(self, parent=QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+        count = min(self.page_size, len(self.entries) - self.loaded)
+        with self._changing():
+            self.beginInsertRows(QModelIndex(), self.loaded, self.loaded + count - 1)
+            self.loaded += count
+            self.endInsertRows()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or not 0 <= index.row() < self.loaded:
+            return None
+        session = self.sessions[self.entries[-1 - index.row()][1]]
+        if role == Qt.DisplayRole:
+            return session["title"]
+        if role == Qt.UserRole:
+            return session["id"]
+        if role == Qt.ToolTipRole:
+            try:
+                updated = datetime.fromisoformat(session["updated"]).strftime("%Y-%m-%d %H:%M")
+            except (KeyError, ValueError):
+                updated = ""
+            return f"{updated}\n{session.get('message_count', 0)}条消息"
+        return None
+
+    # --------------------- 数据操作 ---------------------
+    def reset(self, sessions: Iterable[Dict]):
+        """整体替换会话（启动加载或切换排序时）"""
+        self.beginResetModel()
+        self.sessions = {s["id"]: s for s in sessions}
+        self.keys = {sid: self._key(s) for sid, s in self.sessions.items()}
+        self.entries = sorted(self.keys.values())
+        self.loaded = min(self.page_size, len(self.entries))
+        self.endResetModel()
+
+    def set_sort(self, field: str):
+        if field in SORT_FIELDS and field != self.sort_field:
+            self.sort_field = field
+            self.reset(list(self.sessions.values()))
+
+    def get(self, session_id) -> Optional[Dict]:
+        return self.sessions.get(session_id)
+
+    def all(self) -> List[Dict]:
+        return list(self.sessions.values())
+
+    def row_of(self, session_id) -> int:
+        """会话所在行；未公开或不存在时返回-1"""
+        key = self.keys.get(session_id)
+        if key is None:
+            return -1
+        row = self._row(bisect_left(self.entries, key))
+        return row if row < self.loaded else -1
+
+    def upsert(self, session: Dict):
+        """新增或更新一个会话，只移动或刷新它所在的行"""
+        session_id = session["id"]
+        new_key = self._key(session)
+        old_key = self.keys.get(session_id)
+        self.sessions[session_id] = session
+        self.keys[session_id] = new_key
+        if old_key is None:
+            self._insert(new_key)
+            return
+
+        old_pos = bisect_left(self.entries, old_key)
+        old_row = self._row(old_pos)
+        new_pos = bisect_right(self.entries, new_key)
+        if new_pos > old_pos:
+            new_pos -= 1  # 移除旧位置后的插入点
+        new_row = len(self.entries) - 1 - new_pos
+        if old_row == new_row:
+            self.entries[old_pos] = new_key
+            if old_row < self.loaded:
+                index = self.index(old_row)
+                self.dataChanged.emit(index, index)
+            return
+        if old_row < self.loaded and new_row < self.loaded:
+            # 两行都已显示：移动行，保留视图中的选中状态
+            dest = new_row if new_row < old_row else new_row + 1
+            with self._changing():
+                self.beginMoveRows(QModelIndex(), old_row, old_row, QModelIndex(), dest)
+                del self.entries[old_pos]
+                self.entries.insert(new_pos, new_key)
+                self.endMoveRows()
+            index = self.index(new_row)
+            self.dataChanged.emit(index, index)
+            return
+        self._remove_at(old_pos)
+        self._insert(new_key)
+
+    def remove(self, session_id):
+        key = self.keys.pop(session_id, None)
+        if key is not None:
+            self._remove_at(bisect_left(self.entries, key))
+        self.sessions.pop(session_id, None)  # 移除行之后再删，视图在信号中仍可能读取该行
+
+    def _insert(self, key):
+        pos = bisect_right(self.entries, key)
+        row = len(self.entries) - pos
+        if row <= self.loaded:
+            with self._changing():
+                self.beginInsertRows(QModelIndex(), row, row)
+                self.entries.insert(pos, key)
+                self.loaded += 1
+                self.endInsertRows()
+        else:
+            self.entries.insert(pos, key)  # 尚未滚动到的位置，加载到时再显示
+
+    def _remove_at(self, pos: int):
+        row = self._row(pos)
+        if row < self.loaded:
+            with self._changing():
+                self.beginRemoveRows(QModelIndex(), row, row)
+                del self.entries[pos]
+                self.loaded -= 1
+                self.endRemoveRows()
+        else:
+            del self.entries[pos]
@@ -164,7 +164,7 @@ class SettingsModule(QWidget):
 
     def load_settings(self):
         try:
-            with open("data/settings.json") as f:
+            with open("data/settings.json", encoding="utf-8") as f:
                 self.config = json.load(f)
                 self.theme_combo.setCurrentText(self.config.get("theme", "默认浅色"))
                 self.font_size.setValue(self.config.get("font_size", 12))
@@ -184,8 +184,8 @@ class SettingsModule(QWidget):
             },
             "data_path": self.data_path.text()
         })
-        with open("data/settings.json", "w") as f:
-            json.dump(self.config, f, indent=2)
+        # 每次按键都会触发保存，交给后台队列合并写入
+        self.main_window.data_manager.schedule_save("settings.json", self.config)
 
     def change_theme(self, index):
         theme = self.theme_combo.itemText(index)
@@ -212,6 +212,7 @@ class SettingsModule(QWidget):
         path = QFileDialog.getSaveFileName(self, "导出数据", "study_suite.backup", "备份文件 (*.backup)")[0]
         if path:
             try:
+                self.main_window.data_manager.flush()  # 先写出后台队列中的数据
                 shutil.make_archive(path.replace('.backup', ''), 'zip', self.data_path.text())
                 QMessageBox.information(self, "导出成功", "数据已备份到指定路径")
             except Exception as e:
@@ -222,6 +223,7 @@ class SettingsModule(QWidget):
     # settings.py 中的备份方法
     def create_backup(self):
         backup_path = f"{self.data_path.text()}/backups"
+        self.main_window.data_manager.flush()
         shutil.make_archive(f"{backup_path}/backup", 'zip', self.data_path.text())
     def restore_backup(self):
         self.import_data()  # 复用导入逻辑
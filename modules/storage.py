@@ -0,0 +1,315 @@
+# storage.py
+import os
+import json
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+DB_FILE = "stutrix.db"
+
+# 各数据集的表结构：列名、JSON列、布尔列、是否自增主键、默认排序；lazy列不进入索引查询，按需单条读取
+TABLES = {
+    "todos": {
+        "columns": ["id", "text", "done", "start", "end", "created", "completed"],
+        "json": [],
+        "bool": ["done"],
+        "auto_id": False,
+        "order": "created",
+    },
+    "cards": {
+        "columns": ["id", "title", "answer", "tags", "folder", "proficiency", "last_practiced"],
+        "json": ["tags"],
+        "bool": [],
+        "auto_id": True,
+        "order": "id",
+    },
+    "notes": {
+        "columns": ["id", "title", "tags", "path", "created", "modified"],
+        "json": ["tags"],
+        "bool": [],
+        "auto_id": False,
+        "order": "created",
+    },
+    "pomo_records": {
+        "columns": ["id", "task_id", "duration", "timestamp"],
+        "json": [],
+        "bool": [],
+        "auto_id": True,
+        "order": "timestamp",
+    },
+    "sessions": {
+        "columns": ["id", "title", "created", "updated", "message_count", "byte_size", "history", "summary"],
+        "json": ["history", "summary"],
+        "bool": [],
+        "auto_id": False,
+        "order": "updated",
+        "lazy": ["history", "summary"],
+    },
+}
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS todos (
+    id REAL PRIMARY KEY,
+    text TEXT NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0,
+    "start" TEXT,
+    "end" TEXT,
+    created TEXT,
+    completed TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_todos_created ON todos(created);
+CREATE INDEX IF NOT EXISTS idx_todos_done ON todos(done);
+
+CREATE TABLE IF NOT EXISTS cards (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title TEXT NOT NULL,
+    answer TEXT,
+    tags TEXT,
+    folder TEXT,
+    proficiency INTEGER NOT NULL DEFAULT 0,
+    last_practiced TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_cards_folder ON cards(folder);
+
+CREATE TABLE IF NOT EXISTS notes (
+    id REAL PRIMARY KEY,
+    title TEXT,
+    tags TEXT,
+    path TEXT,
+    created TEXT,
+    modified TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_notes_path ON notes(path);
+
+CREATE TABLE IF NOT EXISTS pomo_records (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    task_id,
+    duration INTEGER,
+    timestamp TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_pomo_timestamp ON pomo_records(timestamp);
+
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    title TEXT,
+    created TEXT,
+    updated TEXT,
+    message_count INTEGER DEFAULT 0,
+    byte_size INTEGER DEFAULT 0,
+    history TEXT,
+    summary TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_updated ON sessions(updated);
+
+CREATE TABLE IF NOT EXISTS kv (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# 旧版数据库缺少的列：(表, 列, 定义)
+ADDED_COLUMNS = [
+    ("sessions", "message_count", "INTEGER DEFAULT 0"),
+    ("sessions", "byte_size", "INTEGER DEFAULT 0"),
+    ("sessions", "summary", "TEXT"),
+]
+
+
+def index_columns(dataset: str) -> List[str]:
+    """索引查询读取的列（不含lazy列）"""
+    spec = TABLES[dataset]
+    return [c for c in spec["columns"] if c not in spec.get("lazy", [])]
+
+
+class SQLiteStore:
+    """基于SQLite（WAL模式）的存储引擎，按数据集提供单条记录读写"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.logger = logging.getLogger('SQLiteStore')
+        self.lock = threading.RLock()
+        self._depth = 0
+        # isolation_level=None：由 transaction() 显式管理事务
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA_SQL)
+        self._add_columns()
+
+    def _add_columns(self):
+        """为旧版数据库补齐新增的列"""
+        for table, column, definition in ADDED_COLUMNS:
+            existing = {row["name"] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+            if column not in existing:
+                self.conn.execute(f'ALTER TABLE {table} ADD COLUMN "{column}" {definition}')
+
+    @contextmanager
+    def transaction(self):
+        """事务上下文，支持嵌套（仅最外层提交）"""
+        with self.lock:
+            if self._depth == 0:
+                self.conn.execute("BEGIN")
+            self._depth += 1
+            try:
+                yield self.conn
+            except Exception:
+                self._depth -= 1
+                if self._depth == 0:
+                    self.conn.execute("ROLLBACK")
+                raise
+            else:
+                self._depth -= 1
+                if self._depth == 0:
+                    self.conn.execute("COMMIT")
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def changes(self) -> int:
+        """本连接打开以来修改过的行数，用于判断数据库是否有变化"""
+        with self.lock:
+            return self.conn.total_changes
+
+    def snapshot(self, path: str):
+        """用SQLite在线备份把当前数据库（含WAL中已提交的内容）完整复制到path"""
+        target = sqlite3.connect(path)
+        try:
+            with self.lock:
+                self.conn.backup(target)
+        finally:
+            target.close()
+
+    # --------------------- 记录编解码 ---------------------
+    def _encode(self, dataset: str, record: Dict) -> List:
+        spec = TABLES[dataset]
+        values = []
+        for col in spec["columns"]:
+            value = record.get(col)
+            if col in spec["json"]:
+                value = json.dumps(value if value is not None else [], ensure_ascii=False)
+            elif col in spec["bool"]:
+                value = 1 if value else 0
+            values.append(value)
+        return values
+
+    def _decode(self, dataset: str, row: sqlite3.Row) -> Dict:
+        spec = TABLES[dataset]
+        record = dict(row)
+        for col in spec["json"]:
+            if col in record:
+                record[col] = json.loads(record[col]) if record[col] else []
+        for col in spec["bool"]:
+            if col in record:
+                record[col] = bool(record[col])
+        return record
+
+    # --------------------- 记录操作 ---------------------
+    def load_all(self, dataset: str) -> List[Dict]:
+        spec = TABLES[dataset]
+        with self.lock:
+            rows = self.conn.execute(
+                f'SELECT * FROM {dataset} ORDER BY "{spec["order"]}"').fetchall()
+        return [self._decode(dataset, row) for row in rows]
+
+    def load_index(self, dataset: str) -> List[Dict]:
+        """只读取索引列，跳过较大的lazy列"""
+        spec = TABLES[dataset]
+        col_sql = ", ".join(f'"{c}"' for c in index_columns(dataset))
+        with self.lock:
+            rows = self.conn.execute(
+                f'SELECT {col_sql} FROM {dataset} ORDER BY "{spec["order"]}"').fetchall()
+        return [self._decode(dataset, row) for row in rows]
+
+    def load_one(self, dataset: str, key: Any) -> Optional[Dict]:
+        """按主键读取完整记录"""
+        with self.lock:
+            row = self.conn.execute(f"SELECT * FROM {dataset} WHERE id = ?", (key,)).fetchone()
+        return self._decode(dataset, row) if row else None
+
+    def upsert(self, dataset: str, record: Dict) -> Any:
+        """插入或更新单条记录，返回主键"""
+        spec = TABLES[dataset]
+        columns = list(spec["columns"])
+        values = self._encode(dataset, record)
+        if spec["auto_id"] and record.get("id") is None:
+            columns, values = columns[1:], values[1:]
+        col_sql = ", ".join(f'"{c}"' for c in columns)
+        placeholders = ", ".join("?" for _ in columns)
+        with self.lock:
+            cursor = self.conn.execute(
+                f"INSERT OR REPLACE INTO {dataset} ({col_sql}) VALUES ({placeholders})", values)
+            return record.get("id") if record.get("id") is not None else cursor.lastrowid
+
+    def upsert_many(self, dataset: str, records: Iterable[Dict]):
+        with self.transaction():
+            for record in records:
+                record["id"] = self.upsert(dataset, record)
+
+    def delete(self, dataset: str, key: Any):
+        with self.lock:
+            self.conn.execute(f"DELETE FROM {dataset} WHERE id = ?", (key,))
+
+    def replace_all(self, dataset: str, records: List[Dict]):
+        """用给定记录整体替换数据集（仅用于批量变更）"""
+        with self.transaction():
+            self.conn.execute(f"DELETE FROM {dataset}")
+            self.upsert_many(dataset, records)
+
+    # --------------------- 键值存储 ---------------------
+    def get_value(self, key: str, default: Any = None) -> Any:
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+        return json.loads(row["value"]) if row else default
+
+    def set_value(self, key: str, value: Any):
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO kv (key, value) VALUES (?, ?)",
+                (key, json.dumps(value, ensure_ascii=False)))
+
+    # --------------------- 旧版JSON迁移 ---------------------
+    def migrate_json(self, data_dir: str):
+        """一次性将旧版各模块的JSON文件导入数据库"""
+        if self.get_value("json_migrated"):
+            return
+        with self.transaction():
+            todos = self._read_json(os.path.join(data_dir, "todos.json"), [])
+            self.upsert_many("todos", [t for t in todos if isinstance(t, dict) and "id" in t])
+
+            card_data = self._read_json(os.path.join(data_dir, "card_data.json"), {})
+            if card_data:
+                self.set_value("card_tags", card_data.get("tags", []))
+                self.set_value("card_folders", card_data.get("folders", ["默认文件夹"]))
+                self.upsert_many("cards", [dict(c, id=None) for c in card_data.get("cards", [])])
+
+            notes_data = self._read_json(os.path.join(data_dir, "notes_data.json"), {})
+            self.upsert_many("notes", notes_data.get("notes", []))
+
+            pomo = self._read_json(os.path.join(data_dir, "pomo_data.json"), [])
+            self.upsert_many("pomo_records", [dict(p, id=None) for p in pomo])
+
+            session_dir = os.path.join(data_dir, "search_sessions")
+            if os.path.isdir(session_dir):
+                sessions = [
+                    self._read_json(os.path.join(session_dir, name), None)
+                    for name in os.listdir(session_dir) if name.endswith(".json")
+                ]
+                self.upsert_many("sessions", [s for s in sessions if isinstance(s, dict)])
+
+            self.set_value("json_migrated", datetime.now().isoformat())
+        self.logger.info("旧版JSON数据已迁移到数据库")
+
+    def _read_json(self, path: str, default: Any) -> Any:
+        if not os.path.exists(path):
+            return default
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            self.logger.warning(f"迁移时读取{path}失败: {str(e)}")
+            return default
@@ -0,0 +1,129 @@
+# tag_index.py
+import re
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+ALL_TAGS = "所有标签"  # 有任意标签的笔记
+NO_TAG = "无标签"      # 没有标签的笔记
+
+# 筛选表达式的词：带引号的标签（可含空格、"-"、"或"，引号内用反斜杠转义）、"|"、不带引号的词
+TERM_RE = re.compile(r'(-?)"((?:[^"\\]|\\.)*)"?|(\|)|([^\s|]+)')
+OR_WORDS = ("OR", "或")  # 单独成词时表示OR
+ESCAPE_RE = re.compile(r"\\(.)")
+
+
+def quote_tag(tag: str) -> str:
+    """把标签写成筛选表达式中的一个词，含空格、运算符或以"-"开头时加引号"""
+    if tag and not re.search(r'[\s|"\\]', tag) and not tag.startswith("-") and tag not in OR_WORDS:
+        return tag
+    return '"' + tag.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def parse_query(expression: str) -> List[Tuple[List[str], List[str]]]:
+    """把筛选表达式解析为OR分组，每组为 (包含的标签, 排除的标签)"""
+    groups = [([], [])]
+    for match in TERM_RE.finditer(expression):
+        negate, quoted, pipe, word = match.groups()
+        if quoted is not None:
+            tag = ESCAPE_RE.sub(r"\1", quoted)
+        elif pipe or word in OR_WORDS:
+            groups.append(([], []))
+            continue
+        elif word.startswith("-"):
+            negate, tag = "-", word[1:]
+        else:
+            tag = word
+        if tag:
+            groups[-1][1 if negate else 0].append(tag)
+    return [group for group in groups if group[0] or group[1]]
+
+
+class TagIndex:
+    """标签 -> 笔记ID 的倒排索引，保存/删除时增量维护，筛选用集合运算完成"""
+
+    def __init__(self):
+        self.notes_by_tag = defaultdict(set)  # 标签 -> 笔记ID集合
+        self.tags_of = {}                     # 笔记ID -> 标签元组
+        self.untagged = set()
+
+    def rebuild(self, notes: Iterable[Dict]):
+        self.notes_by_tag.clear()
+        self.tags_of.clear()
+        self.untagged.clear()
+        for note in notes:
+            self.update(note["id"], note.get("tags", []))
+
+    def update(self, note_id: Any, tags: Iterable[str]):
+        """设置一篇笔记的标签（新增或修改）"""
+        tags = tuple(dict.fromkeys(t for t in tags if t not in (ALL_TAGS, NO_TAG)))
+        old = self.tags_of.get(note_id)
+        if old == tags:
+            return
+        if old is not None:
+            self._unlink(note_id, old)
+        self.tags_of[note_id] = tags
+        for tag in tags:
+            self.notes_by_tag[tag].add(note_id)
+        if not tags:
+            self.untagged.add(note_id)
+
+    def remove(self, note_id: Any):
+        old = self.tags_of.pop(note_id, None)
+        if old is not None:
+            self._unlink(note_id, old)
+
+    def remove_tag(self, tag: str) -> Set:
+        """删除标签，返回受影响的笔记ID"""
+        affected = self.notes_by_tag.pop(tag, set())
+        for note_id in affected:
+            tags = tuple(t for t in self.tags_of[note_id] if t != tag)
+            self.tags_of[note_id] = tags
+            if not tags:
+                self.untagged.add(note_id)
+        return affected
+
+    def _unlink(self, note_id: Any, tags: Tuple[str, ...]):
+        self.untagged.discard(note_id)
+        for tag in tags:
+            ids = self.notes_by_tag.get(tag)
+            if ids is not None:
+                ids.discard(note_id)
+                if not ids:
+                    del self.notes_by_tag[tag]
+
+    # --------------------- 查询 ---------------------
+    def count(self, tag: str) -> int:
+        if tag == ALL_TAGS:
+            return len(self.tags_of) - len(self.untagged)
+        if tag == NO_TAG:
+            return len(self.untagged)
+        return len(self.notes_by_tag.get(tag, ()))
+
+    def tag_counts(self) -> List[Tuple[str, int]]:
+        """固定顺序：所有标签、无标签，其余按名称排序"""
+        return [(ALL_TAGS, self.count(ALL_TAGS)), (NO_TAG, self.count(NO_TAG))] + \
+            [(tag, len(ids)) for tag, ids in sorted(self.notes_by_tag.items())]
+
+    def notes_with(self, tag: str) -> Set:
+        if tag == ALL_TAGS:
+            return set(self.tags_of) - self.untagged
+        if tag == NO_TAG:
+            return set(self.untagged)
+        return set(self.notes_by_tag.get(tag, ()))
+
+    def query(self, expression: str) -> Set:
+        """按表达式筛选笔记ID：空格分隔为AND，"|"（或单独的OR、或）分隔为OR，前缀"-"表示NOT
+
+        例如 '数学 -草稿 | "machine learning"' 表示（数学 且 非草稿）或 machine learning。
+        """
+        result = set()
+        for include, exclude in parse_query(expression):
+            # 先取最小的集合再求交，减少集合运算量
+            sets = sorted((self.notes_with(t) for t in include), key=len)
+            matched = sets[0] if sets else set(self.tags_of)
+            for other in sets[1:]:
+                matched &= other
+            for tag in exclude:
+                matched -= self.notes_with(tag)
+            result |= matched
+        return result
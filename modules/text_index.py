@@ -0,0 +1,224 @@
+# text_index.py
+import re
+import math
+import html
+import heapq
+from collections import Counter, defaultdict
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+
+INDEX_VERSION = 2  # 分词规则变化时递增，触发重建
+BM25_K1 = 1.2
+BM25_B = 0.75
+IN_CHUNK = 500  # 按文档补分时每条查询的参数个数
+PREFIX_EXPANSIONS = 8  # 最后一个查询词按前缀最多扩展的词数（按字典序，完整匹配的词总在最前）
+REBUILD_BATCH = 200  # 重建时每个事务写入的文档数，批次之间释放数据库锁
+
+# 中日韩字符连续段按二元组切分，拉丁字母与数字按单词切分
+TOKEN_RE = re.compile(
+    "[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]+"
+    "|[0-9a-z\u00c0-\u024f]+")
+
+
+def tokenize(text: str, unigrams: bool = False) -> List[str]:
+    """分词：CJK连续段切为二元组（单字保留单字），其余按单词
+
+    unigrams=True 用于建索引：CJK段再额外加入每个单字，单字查询（如"数"）也能命中"代数"。
+    """
+    tokens = []
+    for match in TOKEN_RE.finditer(text.lower()):
+        run = match.group()
+        if run[0] >= "\u3040" and len(run) > 1:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+            if unigrams:
+                tokens.extend(run)
+        else:
+            tokens.append(run)
+    return tokens
+
+
+def snippet(text: str, query: str, width: int = 60) -> str:
+    """截取第一个命中位置附近的文本，返回转义后的HTML，命中词用<b>标出"""
+    terms = sorted(set(tokenize(query)), key=len, reverse=True)
+    text = " ".join(text.split())
+    if not terms:
+        return html.escape(text[:width])
+    pattern = re.compile("|".join(re.escape(t) for t in terms), re.IGNORECASE)
+    first = pattern.search(text)
+    start = max(0, first.start() - width // 3) if first else 0
+    window = text[start:start + width]
+    parts, pos = [], 0
+    for match in pattern.finditer(window):
+        parts.append(html.escape(window[pos:match.start()]))
+        parts.append(f"<b>{html.escape(match.group())}</b>")
+        pos = match.end()
+    parts.append(html.escape(window[pos:]))
+    prefix = "…" if start > 0 else ""
+    suffix = "…" if start + width < len(text) else ""
+    return prefix + "".join(parts) + suffix
+
+
+class TextIndex:
+    """保存在SQLite中的倒排索引（词 -> 文档、词频），按BM25排序"""
+
+    def __init__(self, store, name: str):
+        self.store = store
+        self.name = name
+        self.terms_table = f"{name}_terms"
+        self.docs_table = f"{name}_docs"
+        self.lengths = None      # 文档 -> 词数，首次查询时载入内存，避免每次查询联表
+        self.total_length = 0
+        self.touched = None      # 重建期间被增量更新过的文档，重建时不再用旧内容覆盖
+        with store.lock:
+            store.conn.executescript(f"""
+                CREATE TABLE IF NOT EXISTS {self.terms_table} (
+                    term TEXT NOT NULL,
+                    doc NOT NULL,
+                    tf INTEGER NOT NULL,
+                    PRIMARY KEY (term, doc)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS idx_{self.terms_table}_doc ON {self.terms_table}(doc);
+                CREATE TABLE IF NOT EXISTS {self.docs_table} (
+                    doc PRIMARY KEY,
+                    length INTEGER NOT NULL
+                );
+            """)
+
+    def _cursor(self):
+        # 倒排表查询返回大量行，用普通元组而不是sqlite3.Row
+        cursor = self.store.conn.cursor()
+        cursor.row_factory = None
+        return cursor
+
+    def _load_lengths(self):
+        if self.lengths is None:
+            self.lengths = dict(self._cursor().execute(f"SELECT doc, length FROM {self.docs_table}"))
+            self.total_length = sum(self.lengths.values())
+
+    def _set_length(self, doc: Any, length: Optional[int]):
+        if self.lengths is None:
+            return
+        self.total_length -= self.lengths.pop(doc, 0)
+        if length is not None:
+            self.lengths[doc] = length
+            self.total_length += length
+
+    # --------------------- 增量更新 ---------------------
+    def _write(self, conn, doc: Any, counts: Counter):
+        length = sum(counts.values())
+        conn.execute(f"DELETE FROM {self.terms_table} WHERE doc = ?", (doc,))
+        conn.execute(f"DELETE FROM {self.docs_table} WHERE doc = ?", (doc,))
+        conn.executemany(
+            f"INSERT INTO {self.terms_table} (term, doc, tf) VALUES (?, ?, ?)",
+            [(term, doc, tf) for term, tf in counts.items()])
+        conn.execute(f"INSERT INTO {self.docs_table} (doc, length) VALUES (?, ?)", (doc, length))
+        self._set_length(doc, length)
+
+    def add(self, doc: Any, text: str):
+        """索引（或重新索引）一篇文档"""
+        counts = Counter(tokenize(text, unigrams=True))
+        try:
+            with self.store.transaction() as conn:
+                self._write(conn, doc, counts)
+                if self.touched is not None:
+                    self.touched.add(doc)
+        except Exception:
+            self.lengths = None  # 回滚后内存中的长度可能不一致，下次查询重新载入
+            raise
+
+    def remove(self, doc: Any):
+        with self.store.transaction() as conn:
+            conn.execute(f"DELETE FROM {self.terms_table} WHERE doc = ?", (doc,))
+            conn.execute(f"DELETE FROM {self.docs_table} WHERE doc = ?", (doc,))
+            self._set_length(doc, None)
+            if self.touched is not None:
+                self.touched.add(doc)
+
+    def rebuild(self, documents: Callable[[], Iterable[Tuple[Any, str]]]):
+        """清空后重新索引documents()返回的全部文档；分词在锁外进行，按批写入，期间其他线程仍可读写数据库
+
+        documents在清空并开始记录增量更新之后才调用，读取期间的增量更新不会被清空或覆盖。
+        """
+        with self.store.transaction() as conn:
+            conn.execute(f"DELETE FROM {self.terms_table}")
+            conn.execute(f"DELETE FROM {self.docs_table}")
+            self.lengths = None
+            self.touched = set()
+        try:
+            batch = []
+            for doc, text in documents():
+                batch.append((doc, Counter(tokenize(text, unigrams=True))))
+                if len(batch) >= REBUILD_BATCH:
+                    self._write_batch(batch)
+                    batch = []
+            self._write_batch(batch)
+        except Exception:
+            self.lengths = None
+            raise
+        finally:
+            with self.store.lock:
+                self.touched = None
+
+    def _write_batch(self, batch: List[Tuple[Any, Counter]]):
+        with self.store.transaction() as conn:
+            for doc, counts in batch:
+                if doc not in self.touched:
+                    self._write(conn, doc, counts)
+
+    # --------------------- 查询 ---------------------
+    def _postings(self, cursor, term: str, docs: Optional[List[Any]] = None):
+        """词的倒排项 (文档, 词频)；给定docs时只查这些文档"""
+        sql = f"SELECT doc, tf FROM {self.terms_table} WHERE term = ?"
+        if docs is None:
+            return cursor.execute(sql, (term,)).fetchall()
+        rows = []
+        for i in range(0, len(docs), IN_CHUNK):
+            chunk = docs[i:i + IN_CHUNK]
+            rows += cursor.execute(f"{sql} AND doc IN ({','.join('?' * len(chunk))})",
+                                   (term, *chunk)).fetchall()
+        return rows
+
+    def search(self, query: str, limit: int = 20) -> List[Tuple[Any, float]]:
+        """返回按BM25得分降序的 (文档, 得分)；最后一个查询词按前缀匹配，便于边输入边搜索
+
+        按文档频率从低到高处理查询词（MaxScore）：当剩余词的得分上限之和已不足以让新文档
+        进入前limit名时，高频词只为仍可能进入的已有文档补分，不再读取全部倒排项。
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        k1, b = BM25_K1, BM25_B
+        scores = defaultdict(float)
+        with self.store.lock:
+            self._load_lengths()
+            lengths = self.lengths
+            total = len(lengths)
+            if not total:
+                return []
+            avg_length = self.total_length / total or 1
+            cursor = self._cursor()
+            expanded = [row[0] for row in cursor.execute(
+                f"SELECT DISTINCT term FROM {self.terms_table} WHERE term >= ? AND term < ? LIMIT ?",
+                (terms[-1], terms[-1] + "\uffff", PREFIX_EXPANSIONS))]
+            dfs = {}
+            for term in dict.fromkeys(terms[:-1] + expanded):
+                df = cursor.execute(f"SELECT COUNT(*) FROM {self.terms_table} WHERE term = ?",
+                                    (term,)).fetchone()[0]
+                if df:
+                    dfs[term] = df
+            ordered = sorted(dfs, key=dfs.get)
+            idfs = [math.log(1 + (total - dfs[t] + 0.5) / (dfs[t] + 0.5)) for t in ordered]
+            # bounds[i]：第i个及之后的词能给一篇文档带来的最高得分
+            bounds = [0.0] * (len(ordered) + 1)
+            for i in range(len(ordered) - 1, -1, -1):
+                bounds[i] = bounds[i + 1] + idfs[i] * (k1 + 1)
+
+            for i, term in enumerate(ordered):
+                docs = None
+                if len(scores) >= limit:
+                    threshold = heapq.nlargest(limit, scores.values())[-1]
+                    if bounds[i] < threshold:
+                        docs = [d for d, s in scores.items() if s + bounds[i] >= threshold]
+                for doc, tf in self._postings(cursor, term, docs):
+                    norm = k1 * (1 - b + b * lengths.get(doc, avg_length) / avg_length)
+                    scores[doc] += idfs[i] * tf * (k1 + 1) / (tf + norm)
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
@@ -1,20 +1,20 @@
 # todo.py
-import json,os
 from PyQt5.QtWidgets import *
 from PyQt5.QtCore import *
 from PyQt5.QtGui import *
 from datetime import datetime
+from modules.data_manager import DataManager
 
-TODO_FILE = "data/todos.json"
+TODO_DATASET = "todos"
 
 class TodoModule(QWidget):
     count_changed = pyqtSignal(int)  # 未完成任务数量变化信号
     task_updated = pyqtSignal()  # 新增信号
 
-    def __init__(self):
+    def __init__(self, data_manager=None):
         super().__init__()
         self.todos = []
-        self.ensure_data_dir()
+        self.data_manager = data_manager or DataManager()
         self.load_data()
         self.init_ui()
 
@@ -100,7 +100,7 @@ class TodoModule(QWidget):
         
         self.todos.append(new_todo)
         self.input.clear()
-        self.save_data()
+        self.save_todo(new_todo)
         self.update_list()
         self.count_changed.emit(self.pending_count())
         self.task_updated.emit()
@@ -109,14 +109,14 @@ class TodoModule(QWidget):
         todo = self.todos[self.list.row(item)]
         todo["done"] = not todo["done"]
         todo["completed"] = datetime.now().isoformat() if todo["done"] else None
-        self.save_data()
+        self.save_todo(todo)
         self.update_list()
         self.count_changed.emit(self.pending_count())
 
     def delete_todo(self, todo_id):
         """删除指定任务"""
         self.todos = [t for t in self.todos if t["id"] != todo_id]
-        self.save_data()
+        self.data_manager.delete_record(TODO_DATASET, todo_id)
         self.update_list()
         self.count_changed.emit(self.pending_count())
         self.task_updated.emit()
@@ -135,61 +135,34 @@ class TodoModule(QWidget):
         self.timeline.todos = self.todos  # 更新时间轴数据
         self.timeline.update()  # 强制重绘时间轴
 
-    def ensure_data_dir(self):
-        """确保数据目录存在"""
-        os.makedirs(os.path.dirname(TODO_FILE), exist_ok=True)
-
     def load_data(self):
         """增强数据加载方法"""
         try:
-            if os.path.exists(TODO_FILE):
-                with open(TODO_FILE, "r") as f:
-                    raw_data = json.load(f)
-                    # 数据迁移和验证
-                    self.todos = [self.validate_todo(t) for t in raw_data]
-                    self.todos = [t for t in self.todos if t is not None]
-            else:
-                self.todos = []
+            # 数据迁移和验证由DataManager按结构版本一次性完成
+            self.todos = self.data_manager.load_records(TODO_DATASET)
         except Exception as e:
             QMessageBox.warning(self, "数据错误", f"加载待办数据失败：{str(e)}")
             self.todos = []
 
-    def validate_todo(self, todo):
-        """验证并修复单个待办项数据结构"""
-        required_keys = ["id", "text", "done", "created"]
-        try:
-            # 补全缺失字段
-            if "start" not in todo:
-                todo["start"] = datetime.now().isoformat()
-            if "end" not in todo:
-                todo["end"] = datetime.now().isoformat()
-            if "completed" not in todo:
-                todo["completed"] = None
-                
-            # 转换旧版时间格式
-            if isinstance(todo["created"], str):
-                datetime.fromisoformat(todo["created"])  # 验证时间格式
-            return todo
-        except Exception as e:
-            print(f"无效的待办项已忽略：{todo}，错误：{str(e)}")
-            return None
+    def serialize_todo(self, todo):
+        """转换为可序列化格式"""
+        data = todo.copy()
+        # 确保所有datetime对象转为字符串
+        for key in ["start", "end", "created", "completed"]:
+            if data[key] and isinstance(data[key], datetime):
+                data[key] = data[key].isoformat()
+        return data
+
+    def save_todo(self, todo):
+        """只保存发生变化的单个任务"""
+        if self.data_manager.save_record(TODO_DATASET, self.serialize_todo(todo)) is None:
+            QMessageBox.critical(self, "保存失败", "无法保存待办事项，详见日志")
 
     def save_data(self):
-        """增强数据保存方法"""
-        try:
-            with open(TODO_FILE, "w") as f:
-                # 转换为可序列化格式
-                serializable_data = []
-                for todo in self.todos:
-                    data = todo.copy()
-                    # 确保所有datetime对象转为字符串
-                    for key in ["start", "end", "created", "completed"]:
-                        if data[key] and isinstance(data[key], datetime):
-                            data[key] = data[key].isoformat()
-                    serializable_data.append(data)
-                json.dump(serializable_data, f, indent=2, ensure_ascii=False)
-        except Exception as e:
-            QMessageBox.critical(self, "保存失败", f"无法保存待办事项：{str(e)}")
+        """增强数据保存方法（批量保存全部任务）"""
+        serializable_data = [self.serialize_todo(t) for t in self.todos]
+        if not self.data_manager.save_records(TODO_DATASET, serializable_data):
+            QMessageBox.critical(self, "保存失败", "无法保存待办事项，详见日志")
 
 
 class TimeRangeDialog(QDialog):
@@ -337,8 +310,8 @@ class TodoItemWidget(QWidget):
         for task in self.parent.todos:
             if task["id"] == self.todo_id:
                 task["done"] = self.checkbox.isChecked()
+                self.parent.save_todo(task)
                 break
-        self.parent.save_data()
         self.parent.timeline.update()  # 触发时间轴更新
 
     def paintEvent(self, event):
@@ -364,8 +337,8 @@ class TodoItemWidget(QWidget):
         for todo in self.parent.todos:
             if todo["id"] == self.todo_id:
                 todo["done"] = (state == Qt.Checked)
+                self.parent.save_todo(todo)
                 break
-        self.parent.save_data()
         self.parent.update_list()  # 更新整个列表
         self.parent.timeline.update()  # 更新时间轴
 
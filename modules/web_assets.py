@@ -0,0 +1,160 @@
+# web_assets.py
+"""页面用到的前端库（MathJax、highlight.js）从本地 assets/vendor 目录加载，
+通过自定义URL协议从内存提供给 QWebEngineView，预览和聊天页面无需联网。
+
+安装时必须在项目根目录运行一次 python -m modules.web_assets 下载到本地；缺少文件时程序拒绝启动，不会回退到CDN。
+"""
+import io
+import os
+import sys
+import logging
+import tarfile
+import mimetypes
+import threading
+
+from PyQt5.QtCore import QBuffer, QIODevice, QUrl
+from PyQt5.QtWebEngineCore import QWebEngineUrlScheme, QWebEngineUrlSchemeHandler, QWebEngineUrlRequestJob
+from PyQt5.QtWebEngineWidgets import QWebEngineProfile
+
+SCHEME = b"stutrix"
+ASSET_HOST = "assets"
+BASE_URL = QUrl(f"{SCHEME.decode()}://{ASSET_HOST}/")  # 页面以此为基地址加载，与资源同源
+ASSET_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "assets", "vendor")
+
+# npm包 -> (压缩包地址, 包内目录 -> assets/vendor下的目录)
+VENDOR_PACKAGES = {
+    "mathjax": ("https://registry.npmjs.org/mathjax/-/mathjax-3.2.2.tgz",
+                {"package/es5/": "mathjax/"}),
+    "highlight.js": ("https://registry.npmjs.org/@highlightjs/cdn-assets/-/cdn-assets-11.5.0.tgz",
+                     {"package/highlight.min.js": "highlight/highlight.min.js",
+                      "package/styles/default.min.css": "highlight/styles/default.min.css"}),
+}
+
+# 页面直接引用的入口文件，缺少任何一个都说明资源没有下载完整
+REQUIRED_ASSETS = ("mathjax/tex-svg.js", "highlight/highlight.min.js", "highlight/styles/default.min.css")
+
+# 笔记预览和聊天页面共用的MathJax配置，与markdown_render识别的公式定界符一致
+MATHJAX_CONFIG = r"""<script>
+MathJax = {
+  tex: {
+    inlineMath: [['$', '$'], ['\\(', '\\)']],
+    displayMath: [['$$', '$$'], ['\\[', '\\]']],
+    processEscapes: true,
+    packages: {'[+]': ['amsmath']}
+  },
+  options: {
+    ignoreHtmlClass: 'tex2jax_ignore',
+    processHtmlClass: 'tex2jax_process'
+  },
+  svg: {fontCache: 'none'},  // 每个公式的SVG自包含，便于单独缓存
+  loader: {load: ['[tex]/amsmath']}
+};
+</script>"""
+
+# SVG输出：排版结果可以整体缓存（见formula_cache）
+MATHJAX_SCRIPT = (f'<script id="MathJax-script" async '
+                  f'src="{BASE_URL.toString()}mathjax/tex-svg.js"></script>')
+HIGHLIGHT_TAGS = (f'<link rel="stylesheet" href="{BASE_URL.toString()}highlight/styles/default.min.css">\n'
+                  f'<script src="{BASE_URL.toString()}highlight/highlight.min.js"></script>')
+
+MIME_TYPES = {".js": b"application/javascript", ".css": b"text/css",
+              ".woff": b"font/woff", ".woff2": b"font/woff2", ".json": b"application/json"}
+
+logger = logging.getLogger('WebAssets')
+
+
+def register_scheme():
+    """注册自定义协议，必须在创建QApplication之前调用"""
+    scheme = QWebEngineUrlScheme(SCHEME)
+    scheme.setSyntax(QWebEngineUrlScheme.Syntax.Host)
+    scheme.setFlags(QWebEngineUrlScheme.SecureScheme | QWebEngineUrlScheme.CorsEnabled)
+    QWebEngineUrlScheme.registerScheme(scheme)
+
+
+def missing_assets(directory: str = ASSET_DIR):
+    """返回本地缺少的必需资源文件"""
+    return [path for path in REQUIRED_ASSETS if not os.path.isfile(os.path.join(directory, *path.split("/")))]
+
+
+class AssetSchemeHandler(QWebEngineUrlSchemeHandler):
+    """按路径返回 assets/vendor 下的文件，读取一次后常驻内存"""
+
+    def __init__(self, directory: str = ASSET_DIR, parent=None):
+        super().__init__(parent)
+        self.directory = os.path.realpath(directory)
+        self.files = {}  # 相对路径 -> (MIME类型, 内容)
+        self.lock = threading.Lock()
+
+    def load(self, path: str):
+        with self.lock:
+            if path in self.files:
+                return self.files[path]
+        full_path = os.path.realpath(os.path.join(self.directory, path))
+        if not full_path.startswith(self.directory + os.sep) or not os.path.isfile(full_path):
+            return None
+        with open(full_path, "rb") as f:
+            data = f.read()
+        ext = os.path.splitext(path)[1].lower()
+        mime = MIME_TYPES.get(ext) or (mimetypes.guess_type(path)[0] or "application/octet-stream").encode()
+        with self.lock:
+            self.files[path] = (mime, data)
+        return mime, data
+
+    def requestStarted(self, job: QWebEngineUrlRequestJob):
+        url = job.requestUrl()
+        path = url.path().lstrip("/")
+        entry = self.load(path) if url.host() == ASSET_HOST else None
+        if entry is None:
+            logger.error(f"前端资源不存在: {url.toString()}，请运行 python -m modules.web_assets")
+            job.fail(QWebEngineUrlRequestJob.UrlNotFound)
+            return
+        mime, data = entry
+        buffer = QBuffer(job)  # 随请求一起释放
+        buffer.setData(data)
+        buffer.open(QIODevice.ReadOnly)
+        job.reply(mime, buffer)
+
+
+_handler = None
+
+
+def install_asset_handler(profile: QWebEngineProfile = None) -> AssetSchemeHandler:
+    """在默认配置上安装资源协议处理器（需在QApplication创建之后、页面加载之前）"""
+    global _handler
+    if _handler is None:
+        _handler = AssetSchemeHandler()
+        (profile or QWebEngineProfile.defaultProfile()).installUrlSchemeHandler(SCHEME, _handler)
+    return _handler
+
+
+# --------------------- 下载资源 ---------------------
+def fetch_assets(directory: str = ASSET_DIR):
+    """从npm下载固定版本的前端库并解压到 assets/vendor"""
+    import requests
+
+    for name, (url, members) in VENDOR_PACKAGES.items():
+        print(f"下载 {name}: {url}")
+        response = requests.get(url, timeout=60)
+        response.raise_for_status()
+        count = 0
+        with tarfile.open(fileobj=io.BytesIO(response.content), mode="r:gz") as archive:
+            for member in archive.getmembers():
+                if not member.isfile():
+                    continue
+                for source, target in members.items():
+                    if member.name == source or (source.endswith("/") and member.name.startswith(source)):
+                        relative = target + member.name[len(source):] if source.endswith("/") else target
+                        path = os.path.join(directory, *relative.split("/"))
+                        os.makedirs(os.path.dirname(path), exist_ok=True)
+                        with open(path, "wb") as f:
+                            f.write(archive.extractfile(member).read())
+                        count += 1
+                        break
+        print(f"  已写入{count}个文件")
+    missing = missing_assets(directory)
+    if missing:
+        raise RuntimeError(f"下载的压缩包中缺少: {', '.join(missing)}")
+
+
+if __name__ == "__main__":
+    fetch_assets(sys.argv[1] if len(sys.argv) > 1 else ASSET_DIR)
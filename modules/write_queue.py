@@ -0,0 +1,121 @@
+# write_queue.py
+import time
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import nullcontext
+from typing import Callable, ContextManager, Hashable, List, Optional, Tuple
+
+DEFAULT_DELAY = 0.5  # 合并窗口（秒）
+
+
+class WriteBehindQueue:
+    """后台写入队列：同一键的重复保存在窗口内合并，由工作线程统一落盘"""
+
+    def __init__(self, delay: float = DEFAULT_DELAY,
+                 batch_context: Optional[Callable[[], ContextManager]] = None):
+        self.delay = delay
+        self.batch_context = batch_context or nullcontext  # 每批任务外层的上下文（如数据库事务）
+        self.logger = logging.getLogger('WriteBehindQueue')
+        self.pending = OrderedDict()  # 键 -> 写入任务，按最后提交顺序执行
+        self.cond = threading.Condition()
+        self.batch_due = None         # 当前批次的到期时间
+        self.flush_requested = False
+        self.running = False          # 工作线程是否正在执行任务
+        self.running_keys = set()     # 工作线程正在执行的批次中的键
+        self.stopped = False
+        self.thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self.thread.start()
+
+    def submit(self, key: Hashable, task: Callable[[], None]):
+        """提交写入任务；窗口内同一键只保留最后一次"""
+        with self.cond:
+            if key in self.pending:
+                self.pending.move_to_end(key)
+            self.pending[key] = task
+            if self.batch_due is None:
+                self.batch_due = time.monotonic() + self.delay
+            self.cond.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """立即执行所有待写任务并等待完成，超时返回False"""
+        if threading.current_thread() is self.thread:
+            return True  # 写入任务内部调用时，之前的任务已按顺序执行完
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.cond:
+            if not self.pending and not self.running:
+                return True
+            while self.pending or self.running:
+                # 执行期间新提交的任务也需立即写出
+                self.flush_requested = True
+                self.cond.notify_all()
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.cond.wait(remaining)
+            return True
+
+    def flush_matching(self, predicate: Callable[[Hashable], bool], timeout: Optional[float] = None) -> bool:
+        """只写出键满足predicate的待写任务（在调用线程中执行），其他键不必等待；超时返回False"""
+        if threading.current_thread() is self.thread:
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.cond:
+            # 工作线程正在写同类的键时，等它写完再读，保证顺序
+            while self.running and any(predicate(key) for key in self.running_keys):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.cond.wait(remaining)
+            batch = [(key, task) for key, task in self.pending.items() if predicate(key)]
+            for key, _ in batch:
+                del self.pending[key]
+        if batch:
+            self._execute(batch)
+        return True
+
+    def stop(self, timeout: Optional[float] = None):
+        """写完剩余任务后停止工作线程"""
+        self.flush(timeout)
+        with self.cond:
+            self.stopped = True
+            self.cond.notify_all()
+        self.thread.join(timeout)
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.stopped:
+                    if self.pending and (self.flush_requested
+                                         or time.monotonic() >= self.batch_due):
+                        break
+                    timeout = None
+                    if self.pending:
+                        timeout = max(0.0, self.batch_due - time.monotonic())
+                    self.cond.wait(timeout)
+                if self.stopped and not self.pending:
+                    return
+                batch = list(self.pending.items())
+                self.pending.clear()
+                self.batch_due = None
+                self.flush_requested = False
+                self.running = True
+                self.running_keys = {key for key, _ in batch}
+
+            self._execute(batch)
+
+            with self.cond:
+                self.running = False
+                self.running_keys = set()
+                self.cond.notify_all()
+
+    def _execute(self, batch: List[Tuple[Hashable, Callable[[], None]]]):
+        try:
+            with self.batch_context():
+                for key, task in batch:
+                    try:
+                        task()
+                    except Exception as e:
+                        self.logger.error(f"后台写入{key}失败: {str(e)}")
+        except Exception as e:
+            self.logger.error(f"后台写入批次提交失败: {str(e)}")
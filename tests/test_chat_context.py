@@ -0,0 +1,41 @@
+from modules.chat_context import MESSAGE_OVERHEAD, ContextBuilder, estimate_tokens
+
+
+def message(role, content):
+    return {"role": role, "content": content, "time": "ignored"}
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("你好") == 2
+    assert estimate_tokens("abcdefgh") == 2
+    assert estimate_tokens("") == 0
+
+
+def test_build_keeps_newest_messages_within_budget():
+    builder = ContextBuilder(budget=3 * (25 + MESSAGE_OVERHEAD))
+    history = [message("user" if i % 2 == 0 else "assistant", f"{i}" * 100) for i in range(6)]
+    messages = builder.build({"history": history})
+    assert [m["content"][0] for m in messages] == ["3", "4", "5"]
+    assert all(set(m) == {"role", "content"} for m in messages)
+
+
+def test_newest_message_is_sent_even_over_budget():
+    builder = ContextBuilder(budget=5)
+    assert len(builder.build({"history": [message("user", "x" * 400)]})) == 1
+
+
+def test_summary_replaces_dropped_messages():
+    builder = ContextBuilder(budget=100)
+    history = [message("user", "a" * 400), message("user", "b" * 40)]
+    messages = builder.build({"history": history, "summary": {"text": "之前讨论了a", "upto": 1}})
+    assert messages[0]["role"] == "system" and "之前讨论了a" in messages[0]["content"]
+    assert messages[-1]["content"] == "b" * 40
+
+
+def test_pending_summary_range():
+    builder = ContextBuilder(budget=100)
+    history = [message("user", "a" * 400), message("user", "b" * 400), message("user", "c" * 40)]
+    assert builder.pending_summary({"history": history}) == (0, 2)
+    assert builder.pending_summary({"history": history, "summary": {"text": "s", "upto": 2}}) == (2, 2)
+    request = builder.summary_request({"history": history, "summary": {"text": "s"}}, 0, 2)
+    assert "之前的摘要：s" in request[1]["content"] and "c" * 40 not in request[1]["content"]
@@ -0,0 +1,57 @@
+import threading
+import time
+
+from modules.chat_stream import ChunkCoalescer, SSEParser, cache_key
+
+
+def test_sse_parser_handles_split_chunks_and_crlf():
+    parser = SSEParser()
+    assert parser.feed(b"data: {\"a\"") == []
+    assert parser.feed(b": 1}\r\n\r\n: comment\n\ndata: x\ndata: y\n\nda") == [b'{"a": 1}', b"x\ny"]
+    assert parser.feed(b"ta: [DONE]") == []
+    assert parser.close() == [b"[DONE]"]
+    assert parser.close() == []
+
+
+def test_cache_key_ignores_dict_order():
+    a = cache_key("m", [{"role": "user", "content": "hi"}])
+    b = cache_key("m", [{"content": "hi", "role": "user"}])
+    assert a == b and a != cache_key("other", [{"role": "user", "content": "hi"}])
+
+
+def test_coalescer_emits_when_buffer_is_full():
+    emitted = []
+    coalescer = ChunkCoalescer(emitted.append, interval=60, max_bytes=4)
+    coalescer.last_emit = time.monotonic()
+    coalescer.add("ab")
+    assert emitted == []
+    coalescer.add("cd")
+    assert emitted == ["abcd"]
+    coalescer.discard()
+
+
+def test_coalescer_timer_flushes_after_pause():
+    emitted = threading.Event()
+    parts = []
+
+    def emit(text):
+        parts.append(text)
+        emitted.set()
+
+    coalescer = ChunkCoalescer(emit, interval=0.05, max_bytes=1024)
+    coalescer.last_emit = time.monotonic()
+    coalescer.add("a")
+    coalescer.add("b")
+    assert emitted.wait(5)
+    assert parts == ["ab"]
+
+
+def test_coalescer_discard_cancels_pending_text():
+    parts = []
+    coalescer = ChunkCoalescer(parts.append, interval=0.05, max_bytes=1024)
+    coalescer.last_emit = time.monotonic()
+    coalescer.add("a")
+    coalescer.discard()
+    time.sleep(0.15)
+    coalescer.flush()
+    assert parts == []
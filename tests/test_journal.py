@@ -0,0 +1,52 @@
+from modules.journal import JournalStore, sort_key
+
+
+def test_replay_after_reopen(tmp_path):
+    journal = JournalStore(str(tmp_path))
+    journal.upsert("todos", {"id": 1.0, "text": "a", "created": "2"})
+    journal.upsert("todos", {"id": 2.0, "text": "b", "created": "1"})
+    journal.delete("todos", 1.0)
+    reopened = JournalStore(str(tmp_path))
+    assert [t["text"] for t in reopened.load_all("todos")] == ["b"]
+
+
+def test_auto_ids_are_not_reused_after_delete(tmp_path):
+    journal = JournalStore(str(tmp_path))
+    first = journal.upsert("cards", {"title": "a"})
+    second = journal.upsert("cards", {"title": "b"})
+    journal.delete("cards", second)
+    assert JournalStore(str(tmp_path)).upsert("cards", {"title": "c"}) == second + 1
+    assert first == 1
+
+
+def test_unchanged_upsert_does_not_grow_log(tmp_path):
+    journal = JournalStore(str(tmp_path))
+    journal.upsert("cards", {"id": 1, "title": "a"})
+    size = journal.log_sizes["cards"]
+    journal.upsert("cards", {"id": 1, "title": "a"})
+    journal.upsert_many("cards", [{"id": 1, "title": "a"}])
+    assert journal.log_sizes["cards"] == size
+
+
+def test_compact_keeps_records_and_max_id(tmp_path):
+    journal = JournalStore(str(tmp_path), compact_threshold=200)
+    for i in range(10):
+        journal.upsert("cards", {"title": f"card {i}"})
+    journal.delete("cards", 10)
+    assert journal.log_sizes["cards"] <= 200
+    reopened = JournalStore(str(tmp_path))
+    assert len(reopened.load_all("cards")) == 9
+    assert reopened.upsert("cards", {"title": "new"}) == 11
+
+
+def test_truncated_last_line_is_skipped(tmp_path):
+    journal = JournalStore(str(tmp_path))
+    journal.upsert("cards", {"id": 1, "title": "a"})
+    with open(journal._log_path("cards"), "a", encoding="utf-8") as f:
+        f.write('{"op": "put", "rec')
+    assert [c["title"] for c in JournalStore(str(tmp_path)).load_all("cards")] == ["a"]
+
+
+def test_sort_key_orders_mixed_types_like_sqlite():
+    values = ["b", 2, None, 1.5, "a"]
+    assert sorted(values, key=sort_key) == [None, 1.5, 2, "a", "b"]
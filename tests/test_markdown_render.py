@@ -0,0 +1,52 @@
+import pytest
+
+from modules.markdown_render import BlockRenderer, render_markdown, split_blocks
+
+
+def formulas(html):
+    return html.count('class="tex"')
+
+
+def test_dollar_does_not_pair_with_dollar_in_inline_code():
+    html = render_markdown("costs $6 and `$x$`")
+    assert formulas(html) == 0
+    assert "<code>$x$</code>" in html
+    assert "costs $6 and" in html
+
+
+def test_dollar_does_not_pair_with_dollar_in_fenced_code():
+    html = render_markdown("costs $6\n\n```\necho $HOME\n```\n\nand $4")
+    assert formulas(html) == 0
+    assert "echo $HOME" in html
+
+
+def test_math_next_to_code_is_still_rendered():
+    html = render_markdown("`$a$` and $x_1$")
+    assert formulas(html) == 1
+    assert "<code>$a$</code>" in html
+    assert "$x_1$" in html
+
+
+def test_code_inside_display_math_is_restored():
+    html = render_markdown("$$\\text{`a`}$$")
+    assert formulas(html) == 1
+    assert "\ue002" not in html and "\ue003" not in html
+
+
+def test_split_blocks_keeps_multiline_constructs_together():
+    text = ("# 标题\n\n段落一\n\n```\ncode\n\nmore\n```\n\n$$\na\n\nb\n$$\n\n"
+            "- 项目1\n\n- 项目2\n\n> 引用1\n\n> 引用2\n\n末段")
+    assert split_blocks(text) == [
+        "# 标题", "段落一", "```\ncode\n\nmore\n```", "$$\na\n\nb\n$$",
+        "- 项目1\n\n- 项目2", "> 引用1\n\n> 引用2", "末段"]
+
+
+@pytest.mark.parametrize("text", [
+    "# 标题\n\n段落 $x^2$ 和 `$y$`\n\n- a\n\n  续行\n- b\n\n> q\n\n> r\n\n```python\nx = 1\n\ny = 2\n```",
+    "段落\n\n[链接][1]\n\n[1]: http://example.com",
+    "1. 一\n\n2. 二\n\n正文\n\n    缩进代码\n\n    仍是代码",
+])
+def test_block_renderer_matches_full_render(text):
+    renderer = BlockRenderer()
+    assert renderer.render(text) == render_markdown(text)
+    assert renderer.render(text) == render_markdown(text)  # 第二次来自缓存
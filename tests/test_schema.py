@@ -0,0 +1,40 @@
+import pytest
+
+from modules.schema import Field, Schema, SCHEMAS
+
+
+def test_validate_fills_defaults():
+    todo = SCHEMAS["todos"].validate({"id": 1, "text": "a", "created": "2024-01-01T00:00:00"})
+    assert todo["done"] is False
+    assert todo["completed"] is None
+
+
+@pytest.mark.parametrize("record", [
+    {"id": 1, "created": "2024-01-01T00:00:00"},                 # 缺少必填字段
+    {"id": 1, "text": 3, "created": "2024-01-01T00:00:00"},      # 类型错误
+    {"id": 1, "text": "a", "created": "yesterday"},              # 不是ISO时间
+])
+def test_validate_rejects_invalid_records(record):
+    with pytest.raises(ValueError):
+        SCHEMAS["todos"].validate(record)
+
+
+def rename_title(record):
+    record["name"] = record.pop("title")
+    return record
+
+
+def test_upgrade_migrates_and_keeps_invalid_originals_untouched():
+    schema = Schema("demo", 2, [Field("name", (str,), required=True), Field("size", (int,), default=lambda: 0)],
+                    migrations={1: rename_title})
+    bad = {"title": 5}
+    valid, invalid = schema.upgrade([{"title": "a"}, bad], 1)
+    assert valid == [{"name": "a", "size": 0}]
+    assert invalid == [{"title": 5}] and invalid[0] is bad
+
+
+def test_session_migration_computes_stats():
+    session = {"id": "s", "history": [{"role": "user", "content": "hi"}]}
+    valid, invalid = SCHEMAS["sessions"].upgrade([session], 1)
+    assert not invalid
+    assert valid[0]["message_count"] == 1 and valid[0]["byte_size"] > 0
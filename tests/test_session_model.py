@@ -0,0 +1,61 @@
+import os
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+QtCore = pytest.importorskip("PyQt5.QtCore")
+
+from modules.session_model import SessionListModel  # noqa: E402
+
+
+@pytest.fixture(scope="module", autouse=True)
+def app():
+    return QtCore.QCoreApplication.instance() or QtCore.QCoreApplication([])
+
+
+def session(sid, updated):
+    return {"id": sid, "title": f"会话{sid}", "updated": updated, "created": updated}
+
+
+def titles(model):
+    return [model.data(model.index(row)) for row in range(model.rowCount())]
+
+
+def test_newest_first_with_paging():
+    model = SessionListModel(page_size=2)
+    model.reset([session(i, f"2024-01-0{i}") for i in range(1, 6)])
+    assert titles(model) == ["会话5", "会话4"]
+    assert model.canFetchMore()
+    model.fetchMore()
+    model.fetchMore()
+    assert titles(model) == ["会话5", "会话4", "会话3", "会话2", "会话1"]
+    assert not model.canFetchMore()
+
+
+def test_upsert_moves_updated_session_to_top():
+    model = SessionListModel(page_size=10)
+    model.reset([session(i, f"2024-01-0{i}") for i in range(1, 4)])
+    moved = []
+    model.rowsMoved.connect(lambda *args: moved.append(args))
+    model.upsert(session(1, "2024-02-01"))
+    assert titles(model) == ["会话1", "会话3", "会话2"]
+    assert moved and model.row_of(1) == 0
+
+
+def test_insert_beyond_loaded_page_stays_hidden_until_fetched():
+    model = SessionListModel(page_size=2)
+    model.reset([session(i, f"2024-01-0{i}") for i in range(2, 5)])
+    model.upsert(session(1, "2024-01-01"))
+    assert model.rowCount() == 2 and model.row_of(1) == -1
+    model.upsert(session(9, "2024-03-01"))
+    assert titles(model)[0] == "会话9" and model.rowCount() == 3
+
+
+def test_remove_and_sort_switch():
+    model = SessionListModel(page_size=10)
+    model.reset([{"id": 1, "title": "a", "updated": "2024-01-03", "created": "2024-01-01"},
+                 {"id": 2, "title": "b", "updated": "2024-01-02", "created": "2024-01-02"}])
+    model.set_sort("created")
+    assert titles(model) == ["b", "a"]
+    model.remove(2)
+    assert titles(model) == ["a"] and model.get(2) is None
@@ -0,0 +1,61 @@
+import sqlite3
+
+import pytest
+
+from modules.storage import SQLiteStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SQLiteStore(str(tmp_path / "test.db"))
+    yield store
+    store.close()
+
+
+def test_upsert_roundtrip_decodes_json_and_bool(store):
+    store.upsert("todos", {"id": 1.0, "text": "a", "done": True, "created": "2024-01-01T00:00:00"})
+    store.upsert("cards", {"title": "t", "tags": ["x", "y"]})
+    todo = store.load_one("todos", 1.0)
+    assert todo["done"] is True and todo["text"] == "a"
+    assert store.load_all("cards")[0]["tags"] == ["x", "y"]
+
+
+def test_auto_id_and_update_in_place(store):
+    first = store.upsert("cards", {"title": "a"})
+    second = store.upsert("cards", {"title": "b"})
+    assert second == first + 1
+    store.upsert("cards", {"id": first, "title": "a2"})
+    assert [c["title"] for c in store.load_all("cards")] == ["a2", "b"]
+
+
+def test_load_index_skips_lazy_columns(store):
+    store.upsert("sessions", {"id": "s1", "title": "t", "history": [{"role": "user", "content": "hi"}]})
+    assert "history" not in store.load_index("sessions")[0]
+    assert store.load_one("sessions", "s1")["history"][0]["content"] == "hi"
+
+
+def test_nested_transaction_rolls_back_as_a_whole(store):
+    with pytest.raises(RuntimeError):
+        with store.transaction():
+            store.upsert("cards", {"title": "a"})
+            with store.transaction():
+                store.upsert("cards", {"title": "b"})
+            raise RuntimeError
+    assert store.load_all("cards") == []
+
+
+def test_key_value(store):
+    assert store.get_value("missing", 3) == 3
+    store.set_value("folders", ["默认文件夹"])
+    assert store.get_value("folders") == ["默认文件夹"]
+
+
+def test_snapshot_and_changes(store, tmp_path):
+    before = store.changes()
+    store.upsert("cards", {"title": "a"})
+    assert store.changes() > before
+    path = str(tmp_path / "copy.db")
+    store.snapshot(path)
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT title FROM cards").fetchall() == [("a",)]
+    conn.close()
@@ -0,0 +1,46 @@
+from modules.tag_index import ALL_TAGS, NO_TAG, TagIndex, parse_query, quote_tag
+
+
+def build():
+    index = TagIndex()
+    index.rebuild([
+        {"id": 1, "tags": ["数学", "草稿"]},
+        {"id": 2, "tags": ["数学"]},
+        {"id": 3, "tags": ["machine learning"]},
+        {"id": 4, "tags": []},
+    ])
+    return index
+
+
+def test_parse_query_groups():
+    assert parse_query('数学 -草稿 | "machine learning"') == [(["数学"], ["草稿"]), (["machine learning"], [])]
+    assert parse_query("a OR b 或 c") == [(["a"], []), (["b"], []), (["c"], [])]
+
+
+def test_quote_tag_roundtrips_through_parser():
+    for tag in ["plain", "with space", "-dash", "或", 'say "hi"', "a|b", "back\\slash"]:
+        assert parse_query(quote_tag(tag)) == [([tag], [])]
+
+
+def test_query_and_or_not():
+    index = build()
+    assert index.query("数学") == {1, 2}
+    assert index.query("数学 -草稿") == {2}
+    assert index.query('草稿 | "machine learning"') == {1, 3}
+    assert index.query("-数学") == {3, 4}
+
+
+def test_counts_follow_updates():
+    index = build()
+    assert index.count(ALL_TAGS) == 3 and index.count(NO_TAG) == 1
+    index.update(4, ["数学"])
+    index.remove(3)
+    assert index.count("数学") == 3 and index.count(NO_TAG) == 0
+    assert "machine learning" not in dict(index.tag_counts())
+
+
+def test_remove_tag_returns_affected_notes():
+    index = build()
+    assert index.remove_tag("数学") == {1, 2}
+    assert index.tags_of[2] == () and 2 in index.untagged
+    assert index.query("草稿") == {1}
@@ -0,0 +1,58 @@
+import pytest
+
+from modules.storage import SQLiteStore
+from modules.text_index import TextIndex, snippet, tokenize
+
+
+@pytest.fixture
+def index(tmp_path):
+    store = SQLiteStore(str(tmp_path / "test.db"))
+    yield TextIndex(store, "notes_fts")
+    store.close()
+
+
+def test_tokenize_splits_cjk_into_bigrams():
+    assert tokenize("线性代数 Linear") == ["线性", "性代", "代数", "linear"]
+    assert tokenize("代数", unigrams=True) == ["代数", "代", "数"]
+
+
+def test_search_ranks_by_bm25(index):
+    index.add(1, "矩阵 矩阵 矩阵 特征值")
+    index.add(2, "矩阵 概率")
+    index.add(3, "概率 统计")
+    assert [doc for doc, _ in index.search("矩阵")] == [1, 2]
+
+
+def test_single_cjk_character_and_prefix_match(index):
+    index.add(1, "线性代数")
+    index.add(2, "machine learning")
+    assert [doc for doc, _ in index.search("数")] == [1]
+    assert [doc for doc, _ in index.search("mach")] == [2]
+
+
+def test_readd_and_remove_update_results(index):
+    index.add(1, "alpha")
+    index.add(1, "beta")
+    assert index.search("alpha") == []
+    index.remove(1)
+    assert index.search("beta") == []
+
+
+def test_rebuild_keeps_updates_made_while_reading_documents(index):
+    index.add(1, "old")
+
+    def documents():
+        # 读取文档期间另一处更新了文档2，重建不能用旧内容覆盖它
+        index.add(2, "fresh")
+        yield 1, "alpha"
+        yield 2, "stale"
+
+    index.rebuild(documents)
+    assert [doc for doc, _ in index.search("alpha")] == [1]
+    assert [doc for doc, _ in index.search("fresh")] == [2]
+    assert index.search("stale") == [] and index.search("old") == []
+    assert index.touched is None
+
+
+def test_snippet_escapes_and_highlights():
+    assert snippet("a <b> matrix here", "matrix") == "a &lt;b&gt; <b>matrix</b> here"
@@ -0,0 +1,46 @@
+import threading
+
+import pytest
+
+from modules.write_queue import WriteBehindQueue
+
+
+@pytest.fixture
+def queue():
+    queue = WriteBehindQueue(delay=60)
+    yield queue
+    queue.stop(5)
+
+
+def test_same_key_is_coalesced_to_last_task(queue):
+    written = []
+    for value in range(3):
+        queue.submit("a", lambda value=value: written.append(value))
+    queue.submit("b", lambda: written.append("b"))
+    assert queue.flush(5)
+    assert written == [2, "b"]
+
+
+def test_flush_matching_runs_only_matching_keys_on_caller_thread(queue):
+    threads = []
+    queue.submit(("notes", 1), lambda: threads.append(("notes", threading.current_thread())))
+    queue.submit(("todos", 1), lambda: threads.append(("todos", threading.current_thread())))
+    assert queue.flush_matching(lambda key: key[0] == "notes", timeout=5)
+    assert threads == [("notes", threading.current_thread())]
+    assert list(queue.pending) == [("todos", 1)]
+
+
+def test_failing_task_does_not_block_the_batch(queue):
+    written = []
+    queue.submit("bad", lambda: 1 / 0)
+    queue.submit("good", lambda: written.append(1))
+    assert queue.flush(5)
+    assert written == [1]
+
+
+def test_delay_elapses_without_flush():
+    done = threading.Event()
+    queue = WriteBehindQueue(delay=0.01)
+    queue.submit("a", done.set)
+    assert done.wait(5)
+    queue.stop(5)